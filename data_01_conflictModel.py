@@ -2,10 +2,20 @@
 
 """Core data model and class definitions for GMCR-py."""
 
+import collections
+import hashlib
+import itertools
 import json
+import numpy
 import data_03_gmcrUtilities as gmcrUtil
 from version import __version__
 
+# every arrangement of items taken by an ObjectList gets a unique number.
+_layouts = itertools.count()
+
+# number of preference calculation results kept by each DecisionMaker.
+PREFERENCE_CACHE_SIZE = 8
+
 
 class Option:
     """An option as defined in GMCR.
@@ -48,7 +58,10 @@ class DecisionMaker:
         self.conflict = conflict
         self.options = OptionList(conflict.options)
         self.preferences = ConditionList(conflict)
-        self.lastPreferences = None
+        self._prefCache = collections.OrderedDict()
+        self._validated = None
+        self._rankKey = None
+        self._inputs = None
 
         self.misperceptions = ConditionList(conflict)
         self.perceived = FeasibleList()
@@ -105,52 +118,140 @@ class DecisionMaker:
         for idx, pref in enumerate(self.preferences):
             pref.weight = 2**(len(self.preferences) - idx - 1)
 
-    def calculatePreferences(self):
-        """Calculate the DM's preference ranking of the valid states."""
-        if self.conflict.useManualPreferenceRanking:
-            self.payoffs = gmcrUtil.mapPrefRank2Payoffs(
-                self.preferenceRanking, self.conflict.feasibles)
-            self.usedRanking = self.conflict.useManualPreferenceRanking
-        elif (self.lastPreferences != self.preferences.export_rep() or
-              self.oldFeasibles != self.conflict.feasibles.decimal or
-              self.usedRanking != self.conflict.useManualPreferenceRanking):
+    def _inputsKey(self):
+        """Key identifying everything the DM's calculations depend on."""
+        options = self.conflict.options
+        options.set_indexes()
+        manual = self.conflict.useManualPreferenceRanking
+        return (options.layout, manual,
+                self.options, self.options.version,
+                self.preferences, self.preferences.version,
+                tuple(pref.name for pref in self.preferences),
+                self.misperceptions, self.misperceptions.version,
+                tuple(misp.name for misp in self.misperceptions),
+                self.conflict.feasibles.fingerprint(),
+                getattr(self, 'preferenceRanking', None) if manual else None)
+
+    @property
+    def dirty(self):
+        """True if the DM's options, preferences, misperceptions or the
+        feasible states have changed since recalculate() was last run.
+        """
+        return self._inputs != self._inputsKey()
+
+    def markDirty(self):
+        """Force the next recalculate() to recalculate."""
+        self._inputs = None
 
-            self.lastPreferences = self.preferences.export_rep()
-            self.usedRanking = self.conflict.useManualPreferenceRanking
-            self.oldFeasibles = list(self.conflict.feasibles.decimal)
+    def recalculate(self):
+        """Recalculate perceived states and preferences if dirty.
 
+        Returns True if they were recalculated.
+        """
+        if not self.dirty:
+            return False
+        self.calculatePerceived()
+        self.calculatePreferences()
+        self._inputs = self._inputsKey()
+        return True
+
+    def _preferenceResults(self):
+        """Cached (payoffs, preferenceRanking, satisfaction) of preferences.
+
+        Returns the cache key with the results. Keys are made of the
+        preference statements and a fingerprint of the feasible states.
+        """
+        options = self.conflict.options
+        options.set_indexes()
+        if self._validated != (options.layout, self.preferences.version):
             self.preferences.validate()
+            self._validated = (options.layout, self.preferences.version)
+        feasibles = self.conflict.feasibles
+        key = (tuple(pref.name for pref in self.preferences),
+               feasibles.fingerprint())
+        cache = self._prefCache
+        if key in cache:
+            cache.move_to_end(key)
+        else:
+            satisfaction = gmcrUtil.preferenceSatisfaction(self.preferences,
+                                                           feasibles)
+            cache[key] = gmcrUtil.prefPriorities2payoffs(
+                self.preferences, feasibles, satisfaction) + (satisfaction,)
+            while len(cache) > PREFERENCE_CACHE_SIZE:
+                cache.popitem(last=False)
+        return key, cache[key]
+
+    @property
+    def satisfaction(self):
+        """Packed feasible state x preference statement bit matrix.
+
+        Built once for each set of preferences and feasible states; see
+        gmcrUtil.preferenceSatisfaction for the layout.
+        """
+        return self._preferenceResults()[1][2]
+
+    def statementsSatisfied(self, stateIdx):
+        """Indexes of the preference statements satisfied by a state.
+
+        stateIdx: the index of the state in the conflict's feasible states.
+        """
+        row = numpy.unpackbits(self.satisfaction[stateIdx],
+                               count=len(self.preferences))
+        return numpy.flatnonzero(row).tolist()
+
+    def statesSatisfying(self, prefIdx):
+        """Indexes of the feasible states satisfying preference prefIdx."""
+        column = self.satisfaction[:, prefIdx // 8] >> (7 - prefIdx % 8)
+        return numpy.flatnonzero(column & 1)
+
+    def calculatePreferences(self):
+        """Calculate the DM's preference ranking of the valid states.
+
+        Results are cached, keyed on the preference statements and
+        fingerprints of the feasible and perceived states, so repeated calls
+        with nothing changed are cheap.
+        """
+        feasibles = self.conflict.feasibles
+        if self.conflict.useManualPreferenceRanking:
+            self.payoffs = gmcrUtil.mapPrefRank2Payoffs(
+                self.preferenceRanking, feasibles)
+            rankKey = None
+        else:
+            key, results = self._preferenceResults()
             self.weightPreferences()
-            result = gmcrUtil.prefPriorities2payoffs(self.preferences,
-                                                     self.conflict.feasibles)
-            self.payoffs = result[0]
-            self.preferenceRanking = result[1]
-
-        self.perceivedRanking = []
-        for st in self.preferenceRanking:
-            if isinstance(st, list):
-                subGroup = []
-                for subState in st:
-                    if subState in self.perceived.ordered:
-                        subGroup.append(subState)
-                if len(subGroup) > 1:
-                    self.perceivedRanking.append(subGroup)
-                elif len(subGroup) == 1:
-                    self.perceivedRanking.append(subGroup[0])
-            elif st in self.perceived.ordered:
-                self.perceivedRanking.append(st)
+            self.payoffs, self.preferenceRanking = results[:2]
+            rankKey = (key, self.perceived.fingerprint())
+
+        if rankKey is not None and rankKey == self._rankKey:
+            return
+        self._rankKey = rankKey
+        self.perceivedRanking = gmcrUtil.projectRanking(
+            self.preferenceRanking, self.perceived.maskIn(feasibles))
 
     def calculatePerceived(self):
         """Calculate states perceived by the DM based on misperceptions."""
-        percDash = self.conflict.feasibles.dash
+        feasibles = self.conflict.feasibles
+        if feasibles.stateSet is not None:
+            percPats = feasibles.stateSet
+        else:
+            percPats = feasibles.patterns
+        offPats = feasibles.offPatterns
         for misp in self.misperceptions:
-            res = gmcrUtil.rmvSt(percDash, misp.ynd())
-            percDash = res[0]
+            pat = misp.predicate().patterns[0]
+            res = gmcrUtil.rmvSt(percPats, pat, offPats)
+            percPats = res[0]
             misp.statesRemoved = res[1]
-        toOrd = self.conflict.feasibles.toOrdered
-        self.perceived = FeasibleList(percDash, toOrdered=toOrd)
-        self.misperceived = [st for st in self.conflict.feasibles.ordered
-                             if st not in self.perceived.ordered]
+            if offPats is not None:
+                offPats = offPats + [pat]
+        toOrd = feasibles.toOrdered
+        if feasibles.stateSet is not None:
+            self.perceived = FeasibleList(stateSet=percPats, toOrdered=toOrd,
+                                          offSet=offPats)
+        else:
+            self.perceived = FeasibleList(percPats, toOrdered=toOrd,
+                                          offSet=offPats, minimal=True)
+        perceivedMask = self.perceived.maskIn(feasibles)
+        self.misperceived = (numpy.flatnonzero(~perceivedMask) + 1).tolist()
 
 
 class Condition:
@@ -168,8 +269,10 @@ class Condition:
         for opt, taken in condition:
             self.options.append(opt)
             self.taken.append(taken)
+        self._compiled = None
         self.name = self.ynd()
         self.isCompound = False
+        self.isConditional = False
 
     def __str__(self):
         """String representation of the condition."""
@@ -183,25 +286,40 @@ class Condition:
         """The condition represented as tuples: (option, True/False)."""
         return zip(self.options, self.taken)
 
+    def predicate(self):
+        """The Condition compiled to a gmcrUtil.Predicate.
+
+        The compiled form is cached, and rebuilt only when the positions of
+        the conflict's options change.
+        """
+        options = self.conflict.options
+        options.set_indexes()
+        if self._compiled is None or self._compiled[0] != options.layout:
+            mask = 0
+            value = 0
+            rep = []
+            for opt, taken in self.cond():
+                mask |= 1 << opt.master_index
+                if taken == 'Y':
+                    value |= 1 << opt.master_index
+                rep.append((opt.master_index, taken))
+            pattern = gmcrUtil.Pattern(mask, value, len(options))
+            self._compiled = (options.layout, gmcrUtil.Predicate([pattern]),
+                              pattern.ynd(), rep)
+        return self._compiled[1]
+
     def ynd(self):
         """Return the Condition in 'Yes No Dash' notation."""
-        self.conflict.options.set_indexes()
-        ynd = ['-'] * len(self.conflict.options)
-        for opt, taken in self.cond():
-            ynd[opt.master_index] = taken
-        return ''.join(ynd)
+        self.predicate()
+        return self._compiled[2]
 
     def test(self, state):
-        """Test against a decimal state.
+        """Test against a decimal state, or an array of decimal states.
 
-        Returns True if state satisfies the Condition.
+        Returns True if state satisfies the Condition, or a boolean array
+        when given an array.
         """
-        self.conflict.options.set_indexes()
-        state = gmcrUtil.dec2yn(state, len(self.conflict.options))
-        for opt, taken in self.cond():
-            if state[opt.master_index] != taken:
-                return False
-        return True
+        return self.predicate().test(state)
 
     def isValid(self):
         """Check all options in the Condition are defined in the conflict."""
@@ -213,8 +331,8 @@ class Condition:
 
     def export_rep(self):
         """JSONify the Condition for export."""
-        self.conflict.options.set_indexes()
-        return [(opt.master_index, taken) for opt, taken in self.cond()]
+        self.predicate()
+        return list(self._compiled[3])
 
 
 class CompoundCondition:
@@ -225,6 +343,8 @@ class CompoundCondition:
         self.conflict = conflict
         self.conditions = [Condition(self.conflict, dat) for dat in conditions]
         self.isCompound = True
+        self.isConditional = False
+        self._compiled = None
         self.updateName()
 
     def __str__(self):
@@ -246,10 +366,17 @@ class CompoundCondition:
 
     def updateName(self):
         """Update the name string based on the subconditions."""
+        self._compiled = None
         self.name = str(sorted(self.ynd()))[1:-1].replace("'", '')
 
     def append(self, condition):
-        """Add the condition given to the compound condition."""
+        """Add the condition given to the compound condition.
+
+        Only simple Conditions may be combined; conditional statements are
+        stored as preferences on their own.
+        """
+        if not isinstance(condition, Condition):
+            raise TypeError("{} is not a simple condition".format(condition))
         self.conditions.append(condition)
         self.updateName()
 
@@ -262,16 +389,27 @@ class CompoundCondition:
         """Return the compound condition as a list of items in YND notation."""
         return [cond.ynd() for cond in self.conditions]
 
+    def predicate(self):
+        """The compound condition compiled to a gmcrUtil.Predicate.
+
+        The compiled form is cached, and rebuilt only when the positions of
+        the conflict's options change or the subconditions are edited.
+        """
+        options = self.conflict.options
+        options.set_indexes()
+        if self._compiled is None or self._compiled[0] != options.layout:
+            patterns = [pat for cond in self.conditions
+                        for pat in cond.predicate().patterns]
+            self._compiled = (options.layout, gmcrUtil.Predicate(patterns))
+        return self._compiled[1]
+
     def test(self, state):
         """Test against a decimal state.
 
         Returns True if state satisfies one or more of the component
-        conditions.
+        conditions, or a boolean array when given an array of states.
         """
-        for cond in self.conditions:
-            if cond.test(state):
-                return True
-        return False
+        return self.predicate().test(state)
 
     def isValid(self):
         """Check all options in the Condition are defined in the conflict."""
@@ -287,13 +425,111 @@ class CompoundCondition:
                 "members": [cond.export_rep() for cond in self.conditions]}
 
 
+class ConditionalCondition:
+    """A conditional preference statement: 'A if B', or 'A iff B'.
+
+    A and B are simple Conditions. 'A if B' is satisfied by states that
+    satisfy A or do not satisfy B. 'A iff B' is satisfied by states that
+    satisfy both or neither.
+    """
+
+    def __init__(self, conflict, consequent, antecedent, iff=False):
+        """Create a conditional statement, 'consequent if antecedent'."""
+        self.conflict = conflict
+        if not isinstance(consequent, Condition):
+            consequent = Condition(conflict, consequent)
+        if not isinstance(antecedent, Condition):
+            antecedent = Condition(conflict, antecedent)
+        self.consequent = consequent
+        self.antecedent = antecedent
+        self.iff = iff
+        self.isCompound = False
+        self.isConditional = True
+        self.updateName()
+
+    def __str__(self):
+        """Return string representation."""
+        return self.name + " object"
+
+    def updateName(self):
+        """Update the name string based on the two conditions."""
+        self._compiled = None
+        self.name = "{} {} {}".format(self.consequent.ynd(),
+                                      "iff" if self.iff else "if",
+                                      self.antecedent.ynd())
+
+    def code(self):
+        """The statement in the editor's notation, such as '1 if -2'.
+
+        Options are numbered from 1, and a '-' marks an option not taken.
+        Returns None if either condition involves more than one option.
+        """
+        terms = []
+        for cond in (self.consequent, self.antecedent):
+            if len(cond.options) != 1:
+                return None
+            opt, taken = next(cond.cond())
+            terms.append(("-" if taken == "N" else "") +
+                         str(self.conflict.options.index(opt) + 1))
+        return "{} {} {}".format(terms[0], "iff" if self.iff else "if",
+                                 terms[1])
+
+    def ynd(self):
+        """Return the states satisfying the statement, in YND notation."""
+        return [pat.ynd() for pat in self.predicate().patterns]
+
+    def predicate(self):
+        """The statement compiled to a gmcrUtil.Predicate.
+
+        The compiled form is cached, and rebuilt only when the positions of
+        the conflict's options change.
+        """
+        options = self.conflict.options
+        options.set_indexes()
+        if self._compiled is None or self._compiled[0] != options.layout:
+            cons = self.consequent.predicate().patterns[0]
+            ante = self.antecedent.predicate().patterns[0]
+            if self.iff:
+                both = cons.intersection(ante)
+                patterns = [both] if both is not None else []
+                patterns += gmcrUtil.complementPatterns([cons, ante])
+            else:
+                patterns = [cons] + gmcrUtil.complementPatterns([ante])
+            self._compiled = (options.layout, gmcrUtil.Predicate(patterns))
+        return self._compiled[1]
+
+    def test(self, state):
+        """Test against a decimal state, or an array of decimal states."""
+        return self.predicate().test(state)
+
+    def isValid(self):
+        """Check all options in the statement are defined in the conflict."""
+        if not (self.consequent.isValid() and self.antecedent.isValid()):
+            return False
+        self.updateName()
+        return True
+
+    def export_rep(self):
+        """JSONify the ConditionalCondition for export."""
+        return {"conditional": "iff" if self.iff else "if",
+                "consequent": self.consequent.export_rep(),
+                "antecedent": self.antecedent.export_rep()}
+
+
 class ObjectList:
-    """A base class for lists of DMs/options. Defines useful magic methods."""
+    """A base class for lists of DMs/options. Defines useful magic methods.
+
+    version is incremented whenever the list is changed. layout identifies
+    the item indexes set by set_indexes, and changes only when they do.
+    """
 
     def __init__(self, masterList=None):
         """Initialize a generic ObjectList."""
         self.itemList = []
         self.masterList = masterList
+        self.version = 0
+        self.layout = next(_layouts)
+        self._indexed = None
 
     def __len__(self):
         return len(self.itemList)
@@ -303,16 +539,19 @@ class ObjectList:
 
     def __setitem__(self, key, value):
         self.itemList[key] = value
+        self.version += 1
 
     def __delitem__(self, key):
         item = self.itemList[key]
         del self.itemList[key]
+        self.version += 1
         if self.masterList is not None:
             self.masterList.remove(item)
 
     def remove(self, item):
         """Remove the passed item from the list."""
         self.itemList.remove(item)
+        self.version += 1
         if self.masterList is not None:
             self.masterList.remove(item)
 
@@ -328,9 +567,11 @@ class ObjectList:
     def insert(self, i, x):
         """Standard list insert behaviour."""
         self.itemList.insert(i, x)
+        self.version += 1
 
     def pop(self, i=None):
         """Standard list pop behaviour."""
+        self.version += 1
         return self.itemList.pop(i)
 
     def index(self, i):
@@ -339,9 +580,17 @@ class ObjectList:
 
     def set_indexes(self):
         """Set each list item's index attribute based on the list order."""
+        if self._indexed == (self.version, len(self.itemList)):
+            return
+        changed = self._indexed is None or self._indexed[1] != len(self)
         for idx, item in enumerate(self.itemList):
+            if getattr(item, 'master_index', None) != idx:
+                changed = True
             item.master_index = idx
             item.dec_val = 2**(idx)
+        if changed:
+            self.layout = next(_layouts)
+        self._indexed = (self.version, len(self.itemList))
 
     def names(self):
         """Get string names of all items in the list."""
@@ -372,12 +621,15 @@ class DecisionMakerList(ObjectList):
         """
         if isinstance(item, DecisionMaker) and item not in self.itemList:
             self.itemList.append(item)
+            self.version += 1
         elif isinstance(item, str):
             self.itemList.append(DecisionMaker(self.conflict, item))
+            self.version += 1
 
     def __delitem__(self, key):
         self.itemList[key].onDelete()
         del self.itemList[key]
+        self.version += 1
 
     def from_json(self, dmData):
         """Create a new DM from JSON data and add it to the list."""
@@ -424,6 +676,7 @@ class OptionList(ObjectList):
         """
         if isinstance(item, Option) and item not in self.itemList:
             self.itemList.append(item)
+            self.version += 1
             if self.masterList is not None:
                 item.addRef()
                 if item not in self.masterList:
@@ -436,6 +689,7 @@ class OptionList(ObjectList):
                 self.masterList.append(newOption)
                 newOption.addRef()
             self.itemList.append(newOption)
+            self.version += 1
 
     def from_json(self, optData):
         """Create a new option from JSON data and add it to the list."""
@@ -461,6 +715,9 @@ class ConditionList(ObjectList):
         if isinstance(condData, list):
             for opt in condData:
                 opt[0] = self.conflict.options[opt[0]]
+        elif isinstance(condData, dict) and 'conditional' in condData:
+            for opt in condData['consequent'] + condData['antecedent']:
+                opt[0] = self.conflict.options[opt[0]]
         elif isinstance(condData, dict):
             for mem in condData['members']:
                 for opt in mem:
@@ -470,13 +727,19 @@ class ConditionList(ObjectList):
     def append(self, item):
         """Add a new condition to the list.
 
-        Argument can be a Condition, CompoundCondition, list/string format
-        condition, or a dict/string format CompoundCondition.
+        Argument can be a Condition, CompoundCondition,
+        ConditionalCondition, list/string format condition, or a dict format
+        CompoundCondition or ConditionalCondition.
         """
-        if isinstance(item, Condition) or isinstance(item, CompoundCondition):
+        if isinstance(item, (Condition, CompoundCondition,
+                             ConditionalCondition)):
             newCondition = item
         elif isinstance(item, list):
             newCondition = Condition(self.conflict, item)
+        elif isinstance(item, dict) and 'conditional' in item:
+            newCondition = ConditionalCondition(
+                self.conflict, item['consequent'], item['antecedent'],
+                item['conditional'] == 'iff')
         elif isinstance(item, dict):
             newCondition = CompoundCondition(self.conflict, item['members'])
         else:
@@ -484,6 +747,7 @@ class ConditionList(ObjectList):
 
         if newCondition.name not in [cond.name for cond in self]:
             self.itemList.append(newCondition)
+            self.version += 1
         else:
             print("attempted to add duplicate; ignored")
 
@@ -518,53 +782,246 @@ class ConditionList(ObjectList):
         if fmt == 'YN':
             return sorted(set(gmcrUtil.expandPatterns(self.format('YN-'))))
         if fmt == 'dec':
-            return [self.yn2dec(state) for state in self.format('YN')]
+            return gmcrUtil.yn2decArray(self.format('YN')).tolist()
         else:
             print('invalid format')
 
 
 class FeasibleList:
-    """A list of feasible states, allowing access in multiple formats."""
-
-    def __init__(self, dash=None, toOrdered=None):
-        """Construct a list of feasibles based on a dash format input list."""
-        if not dash:
-            self.decimal = []
-            self.dash = []
-            self.ordered = []
-            return
-        # as 'Y,N,-' compact patterns
-        self.dash = gmcrUtil.reducePatterns(dash)
+    """A list of feasible states, allowing access in multiple formats.
 
-        temp = sorted([(gmcrUtil.yn2dec(yn), yn) for yn
-                       in gmcrUtil.expandPatterns(self.dash)])
-
-        # as 'Y,N' patterns
-        self.yn = [yn for dec, yn in temp]
-
-        # as decimal values
-        self.decimal = [dec for dec, yn in temp]
+    States are stored as typed arrays. The decimal states are only listed
+    when first needed, so the number of states can be found from the
+    patterns alone. The 'Y,N' strings, display strings, and translation
+    mappings are generated on demand.
+    """
 
-        # conversion dictionaries
+    __slots__ = ('_patterns', 'stateSet', 'offPatterns', 'numOpts', '_decimal',
+                 '_decimalSource', '_toOrderedSource', '_ordered', '_ordVals',
+                 '_count', '_dash', '_bits', '_toOrdered', '_toDecimal',
+                 '_index', '_fingerprint', '_unreduced', '_mask')
+
+    def __init__(self, dash=None, toOrdered=None, decimal=None, offSet=None,
+                 minimal=False, stateSet=None):
+        """Construct a list of feasibles based on a dash format input list.
+
+        dash may be given as YND strings or as gmcrUtil.Pattern objects.
+        stateSet (optional) is a gmcrUtil.StateSet to use instead of dash.
+        Patterns are then only generated if they are accessed.
+        decimal (optional) is the sorted array of states matched by dash, or
+        a function returning it, if it can be found more quickly than by
+        expanding the patterns.
+        offSet (optional) is a list of Patterns matching exactly the states
+        not in dash, used when minimizing and counting the patterns.
+        minimal (optional) skips minimization when dash is already a minimal
+        cover, such as the result of gmcrUtil.rmvSt. If decimal is given,
+        minimization is put off until the patterns are accessed.
+        """
+        self._decimal = None
+        self._ordered = None
+        self._ordVals = None
+        self._count = None
+        self._dash = None
+        self._bits = None
+        self._toOrdered = None
+        self._toDecimal = None
+        self._index = None
+        self._fingerprint = None
+        self._unreduced = None
+        self._mask = None
+        self._toOrderedSource = toOrdered
+        self.offPatterns = offSet
+        self.stateSet = stateSet
+        if stateSet is not None:
+            self._patterns = None
+            self.numOpts = stateSet.numOpts
+            if decimal is None:
+                decimal = stateSet.states
+            self._decimalSource = decimal
+        elif not dash:
+            self._patterns = []
+            self.numOpts = offSet[0].numOpts if offSet else 0
+            self._decimalSource = []
+        else:
+            # as bit mask patterns
+            self._patterns = gmcrUtil._asPatterns(dash)
+            self.numOpts = self._patterns[0].numOpts
+            if not minimal and decimal is not None:
+                self._unreduced = self._patterns
+                self._patterns = None
+            elif not minimal:
+                self._patterns = gmcrUtil.reducePatterns(self._patterns,
+                                                         offSet)
+            self._decimalSource = decimal
+
+    @property
+    def patterns(self):
+        """States as gmcrUtil.Pattern objects."""
+        if self._patterns is None:
+            if self.stateSet is not None:
+                pats = self.stateSet.patterns()
+            else:
+                pats = self._unreduced
+                self._unreduced = None
+            if pats:
+                pats = gmcrUtil.reducePatterns(pats, self.offPatterns)
+            self._patterns = pats
+        return self._patterns
+
+    def _listStates(self):
+        """Generate the decimal states and their ordered numbers."""
+        source = self._decimalSource
+        if source is None:
+            source = gmcrUtil.patternStates(self.patterns)
+        elif callable(source):
+            source = source()
+        self._decimal = gmcrUtil.StateArray(source)
+        self._decimalSource = None
+
+        # ordered numbers, aligned with the decimal values
+        toOrdered = self._toOrderedSource
         if toOrdered is None:
-            self.toOrdered, self.toDecimal = gmcrUtil.orderedNumbers(
-                self.decimal)
+            self._ordVals = numpy.arange(1, len(self._decimal) + 1,
+                                         dtype=numpy.int64)
+        elif isinstance(toOrdered, gmcrUtil.StateMap):
+            self._ordVals = toOrdered.lookup(self._decimal.array)
         else:
-            self.toOrdered = {x: toOrdered[x] for x in self.decimal}
-            self.toDecimal = {toOrdered[x]: x for x in self.decimal}
+            self._ordVals = numpy.array([toOrdered[x] for x in self._decimal],
+                                        dtype=numpy.int64)
+        self._toOrderedSource = None
+        self._ordered = gmcrUtil.StateArray(numpy.sort(self._ordVals))
+
+    @property
+    def decimal(self):
+        """States as decimal values."""
+        if self._decimal is None:
+            self._listStates()
+        return self._decimal
+
+    @property
+    def ordered(self):
+        """States as ordered numbers."""
+        if self._ordered is None:
+            self._listStates()
+        return self._ordered
+
+    def count(self):
+        """Number of states in the list.
+
+        Counted from the patterns if the states have not been listed yet.
+        """
+        if self._count is None:
+            if self._decimal is not None:
+                self._count = len(self._decimal)
+            elif self.stateSet is not None:
+                self._count = self.stateSet.count()
+            elif not self.patterns:
+                self._count = 0
+            elif self.offPatterns is not None:
+                self._count = (2**self.numOpts -
+                               gmcrUtil.countStates(self.offPatterns))
+            else:
+                self._count = gmcrUtil.countStates(self.patterns)
+        return self._count
 
-        # as ordered numbers
-        self.ordered = sorted(self.toDecimal.keys())
+    def fingerprint(self):
+        """A hashable key for the set of states in the list.
 
-        # special display notation
-        self.ordDec = ['{:3d}  [{}]'.format(seq, dec)
-                       for seq, dec in zip(self.ordered, self.decimal)]
+        Lists with different states never have equal fingerprints. It is
+        found from the state set or the offSet if possible, and otherwise
+        by hashing the listed states.
+        """
+        if self._fingerprint is None:
+            if self.stateSet is not None:
+                self._fingerprint = ('stateSet', self.stateSet)
+            elif self.offPatterns is not None:
+                self._fingerprint = ('offSet', self.numOpts,
+                                     frozenset(self.offPatterns))
+            else:
+                digest = hashlib.blake2b(self.bits.tobytes()).hexdigest()
+                self._fingerprint = ('states', self.numOpts, len(self),
+                                     digest)
+        return self._fingerprint
+
+    @property
+    def dash(self):
+        """States as 'Y,N,-' compact patterns."""
+        if self._dash is None:
+            self._dash = [p.ynd() for p in self.patterns]
+        return self._dash
+
+    @property
+    def bits(self):
+        """States as a packed state x option bit matrix."""
+        if self._bits is None:
+            self._bits = gmcrUtil.packStates(self.decimal.array, self.numOpts)
+        return self._bits
+
+    @property
+    def yn(self):
+        """States as 'Y,N' patterns."""
+        dec = self.decimal.array
+        numOpts = self.numOpts
+        return gmcrUtil.LazyList(
+            lambda idx: gmcrUtil.dec2yn(int(dec[idx]), numOpts), len(dec),
+            lambda idx: gmcrUtil.dec2ynArray(dec[idx], numOpts).tolist())
+
+    @property
+    def ordDec(self):
+        """Special display notation."""
+        dec = self.decimal.array
+        ordered = self.ordered.array
+        return gmcrUtil.LazyList(
+            lambda idx: '{:3d}  [{}]'.format(ordered[idx], dec[idx]),
+            len(dec))
+
+    @property
+    def toOrdered(self):
+        """Decimal -> ordered number mapping."""
+        if self._toOrdered is None:
+            self._toOrdered = gmcrUtil.StateMap(self.decimal.array,
+                                                self._ordVals)
+        return self._toOrdered
+
+    @property
+    def toDecimal(self):
+        """Ordered number -> decimal mapping."""
+        if self._toDecimal is None:
+            decimal = self.decimal.array
+            self._toDecimal = gmcrUtil.StateMap(self._ordVals, decimal)
+        return self._toDecimal
+
+    def indexOf(self, states):
+        """Index of each decimal state in the list, or -1 if not feasible.
+
+        states may be a single decimal state or an array of them.
+        """
+        if self._index is None:
+            self._index = gmcrUtil.StateIndex(self.decimal.array,
+                                              self.numOpts)
+        return self._index.find(states)
+
+    def maskIn(self, feasibles):
+        """Boolean mask over the states of feasibles, True for those in this
+        list.
+        """
+        if self._mask is None or self._mask[0] is not feasibles:
+            if self is feasibles:
+                mask = numpy.ones(len(feasibles), bool)
+            else:
+                mask = numpy.zeros(len(feasibles), bool)
+                idx = feasibles.indexOf(self.decimal.array)
+                mask[idx[idx >= 0]] = True
+            self._mask = (feasibles, mask)
+        return self._mask[1]
 
     def __len__(self):
-        return len(self.decimal)
+        if self._count is not None:
+            return self._count
+        return self.count()
 
     def __iter__(self):
-        return iter(range(len(self.decimal)))
+        return iter(range(self.count()))
 
 
 class Coalition:
@@ -657,8 +1114,19 @@ class Coalition:
         for dm in self.members:
             dm.calculatePerceived()
         toOrd = self.conflict.feasibles.toOrdered
-        percDash = [d for dm in self.members for d in dm.perceived.dash]
-        self.perceived = FeasibleList(percDash, toOrdered=toOrd)
+        if self.conflict.feasibles.stateSet is not None:
+            percSet = self.members[0].perceived.stateSet
+            for dm in self.members[1:]:
+                percSet = percSet.union(dm.perceived.stateSet)
+            self.perceived = FeasibleList(stateSet=percSet, toOrdered=toOrd)
+            return
+        feasibles = self.conflict.feasibles
+        mask = numpy.zeros(len(feasibles), bool)
+        for dm in self.members:
+            mask |= dm.perceived.maskIn(feasibles)
+        percPats = [p for dm in self.members for p in dm.perceived.patterns]
+        self.perceived = FeasibleList(percPats, toOrdered=toOrd,
+                                      decimal=feasibles.decimal.array[mask])
 
 
 class CoalitionList(ObjectList):
@@ -697,8 +1165,10 @@ class CoalitionList(ObjectList):
         """Add a Coalition or DecisionMaker to the list."""
         if isinstance(item, Coalition) and item not in self.itemList:
             self.itemList.append(item)
+            self.version += 1
         elif isinstance(item, DecisionMaker):
             self.itemList.append(item)
+            self.version += 1
         else:
             raise TypeError("{} is not a Coalition".format(item))
 
@@ -740,6 +1210,13 @@ class ConflictModel:
         # list of Condition objects
         self.infeasibles = ConditionList(self)
         self.feasibles = FeasibleList()
+        # (condition, feasible patterns, states removed) for each prefix of
+        # the infeasible conditions, and the last enumerated states.
+        self._feasCache = []
+        self._feasDecCache = (None, [], None)
+        # store state sets as BDDs; None to decide by the number of options.
+        self.useBDD = None
+        self._bdd = None
 
         self.useManualPreferenceRanking = False
         self.preferenceErrors = None
@@ -753,6 +1230,10 @@ class ConflictModel:
         """Create a new CompoundCondition linked to the conflict."""
         return CompoundCondition(self, condData)
 
+    def newConditionalCondition(self, consequent, antecedent, iff=False):
+        """Create a new ConditionalCondition linked to the conflict."""
+        return ConditionalCondition(self, consequent, antecedent, iff)
+
     def newCoalition(self, coalitionData):
         """Create a new Coalition linked to the conflict."""
         return Coalition(self, coalitionData)
@@ -833,18 +1314,93 @@ class ConflictModel:
             fileObj.close()
 
     def recalculateFeasibleStates(self, init_override=False):
-        """Update all feasible state calculations."""
-        oldFeas = list(self.feasibles.decimal)
-        feasDash = ['-' * len(self.options)]
-        for infeas in self.infeasibles:
-            res = gmcrUtil.rmvSt(feasDash, infeas.ynd())
-            feasDash = res[0]
-            infeas.statesRemoved = res[1]
-        self.feasibles = FeasibleList(feasDash)
-        if self.feasibles.decimal != oldFeas:
+        """Update all feasible state calculations.
+
+        Results after each infeasible condition are cached, so only the
+        conditions following the first changed one are subtracted again.
+        """
+        numOpts = len(self.options)
+        infeasPats = [infeas.predicate().patterns[0]
+                      for infeas in self.infeasibles]
+        bdd = self.stateSetManager()
+        cache = self._feasCache
+        if cache and (bdd is None) != isinstance(cache[0][1], list):
+            # backend changed since the results were cached.
+            del cache[:]
+        keep = 0
+        while (keep < len(cache) and keep < len(infeasPats) and
+               cache[keep][0] == infeasPats[keep]):
+            keep += 1
+        del cache[keep:]
+        if keep:
+            feasPats = cache[-1][1]
+        elif bdd is not None:
+            feasPats = bdd.full()
+        else:
+            feasPats = [gmcrUtil.Pattern.full(numOpts)]
+        for idx in range(keep, len(infeasPats)):
+            feasPats, numRmvd = gmcrUtil.rmvSt(feasPats, infeasPats[idx],
+                                               infeasPats[:idx])
+            cache.append((infeasPats[idx], feasPats, numRmvd))
+        for infeas, entry in zip(self.infeasibles, cache):
+            infeas.statesRemoved = entry[2]
+
+        prevOpts, prevPats, prevDec = self._feasDecCache
+
+        def listStates():
+            if (prevOpts == numOpts and len(prevPats) <= len(infeasPats) and
+                    prevPats == infeasPats[:len(prevPats)]):
+                # conditions were only appended; filter the previous states.
+                feasDec = gmcrUtil.filterStates(
+                    prevDec, exclude=infeasPats[len(prevPats):])
+            elif sum(pat.count() for pat in feasPats) * 64 < 2**numOpts:
+                # few feasible states; expand the cover instead of scanning
+                # the whole state space.
+                feasDec = gmcrUtil.patternStates(feasPats)
+            else:
+                feasDec = gmcrUtil.enumerateStates(numOpts,
+                                                   exclude=infeasPats)
+            self._feasDecCache = (numOpts, infeasPats, feasDec)
+            return feasDec
+
+        oldFeas = self.feasibles
+        if bdd is not None:
+            self.feasibles = FeasibleList(stateSet=feasPats,
+                                          offSet=infeasPats)
+        else:
+            self.feasibles = FeasibleList(feasPats, decimal=listStates,
+                                          offSet=infeasPats, minimal=True)
+        if (oldFeas.stateSet is not None and bdd is not None and
+                oldFeas.stateSet.bdd is bdd):
+            unchanged = oldFeas.stateSet == feasPats
+        elif oldFeas.numOpts == numOpts and oldFeas.offPatterns is not None:
+            unchanged = gmcrUtil.sameStates(oldFeas.offPatterns, infeasPats)
+        else:
+            unchanged = (len(oldFeas) == len(self.feasibles) and
+                         gmcrUtil.sameStates(oldFeas.patterns,
+                                             self.feasibles.patterns))
+        if not unchanged:
             if not init_override:
                 self.onFeasibleStatesChanged()
 
+    def stateSetManager(self):
+        """BDD manager for the conflict's state sets, or None if not used.
+
+        BDDs are used if useBDD is True, or if it is None and the conflict
+        has at least gmcrUtil.BDD_MIN_OPTIONS options.
+        """
+        numOpts = len(self.options)
+        useBDD = self.useBDD
+        if useBDD is None:
+            useBDD = numOpts >= gmcrUtil.BDD_MIN_OPTIONS
+        if not useBDD:
+            return None
+        if self._bdd is None or self._bdd.numOpts != numOpts:
+            self._bdd = gmcrUtil.BDD(numOpts)
+        else:
+            self._bdd.clearCache()
+        return self._bdd
+
     def onFeasibleStatesChanged(self):
         """Clear obsolete preferences when feasible states are changed."""
         self.useManualPreferenceRanking = False
@@ -5,6 +5,7 @@
 import numpy as np
 import itertools
 import json
+import data_03_gmcrUtilities as gmcrUtil
 
 
 class RMGenerator:
@@ -32,6 +33,15 @@ class RMGenerator:
         else:
             self.effectiveDMs = self.conflict.decisionMakers
 
+        decimals = conflict.feasibles.decimal.array
+        fwdMask = 0
+        backMask = 0
+        for option in conflict.options:
+            if option.permittedDirection == "fwd":
+                fwdMask |= option.dec_val
+            elif option.permittedDirection == "back":
+                backMask |= option.dec_val
+
         for dm in self.effectiveDMs:
             dm.calculatePreferences()
             dm.calculatePerceived()
@@ -47,71 +57,28 @@ class RMGenerator:
                 pmTemp = np.array(dm.payoffs)
                 dm.payoffMatrix = pmTemp[np.newaxis, :] - pmTemp[:, np.newaxis]
 
-            # generate a flat list of move values controlled by other DMs
-
-            otherCOsMoves = [option.dec_val for otherDM in self.effectiveDMs
-                             if otherDM != dm for option in otherDM.options]
-            focalCOmoves = [option.dec_val for option in dm.options]
-
-            # translate the list of moves values for other DMs into a list of
-            # base states
-            fixedStates = [0]
-            for val in otherCOsMoves:
-                fixedStates = [y + z for y in fixedStates for z in [0, val]]
-
-            # translate the list of focal DM move values into a list of focal
-            # DM states
-            manipulatedStates = [0]
-            for val in focalCOmoves:
-                manipulatedStates = [y + z for y in manipulatedStates
-                                     for z in [0, val]]
-
-            # find the full set of mutually reachable states (controlled by the
-            # focal DM) for each fixed state (controlled by the other DMs)
-            for state in fixedStates:
-                reachable = [state]     # starting point
-                # full reachable set
-                reachable = [y + z for y in reachable
-                             for z in manipulatedStates]
-                # remove infeasibles
-                reachable = [y for y in reachable
-                             if (y in conflict.feasibles.decimal)]
-
-                # add one set of mutually reachable states
-                for state0 in reachable:
-                    s0 = self.conflict.feasibles.toOrdered[state0] - 1
-                    for state1 in reachable:
-                        s1 = self.conflict.feasibles.toOrdered[state1] - 1
-                        if s0 != s1:
-                            dm.reachability[s0, s1] = 1
-
-            # Remove irreversible states ######################################
-            for option in conflict.options:
-                if option.permittedDirection != "both":
-                    for idx0, state0yn in enumerate(conflict.feasibles.yn):
-                        # does state have potential for irreversible move?
-                        # value of the irreversible move option in DMs current
-                        # state (Y/N)
-                        val0 = state0yn[option.master_index]
-                        if (val0 == "Y") and (
-                           option.permittedDirection == "fwd") or (
-                           val0 == "N") and (
-                           option.permittedDirection == "back"):
-                            for idx1, state1yn in enumerate(
-                                    conflict.feasibles.yn):
-                                # is target move irreversible?
-                                val1 = state1yn[option.master_index]
-                                if val0 != val1:
-                                    # remove irreversible moves from
-                                    # reachability matrix
-                                    dm.reachability[idx0, idx1] = 0
+            # states that differ only in options controlled by the focal DM
+            # are mutually reachable.
+            otherCOsMask = 0
+            for otherDM in self.effectiveDMs:
+                if otherDM != dm:
+                    for option in otherDM.options:
+                        otherCOsMask |= option.dec_val
+            focalCOmask = 0
+            for option in dm.options:
+                focalCOmask |= option.dec_val
+            rows, cols = gmcrUtil.reachabilityEdges(decimals, focalCOmask,
+                                                    otherCOsMask)
+
+            # Remove irreversible moves: an option may not be taken from Y
+            # to N if it is "fwd" only, or from N to Y if it is "back" only.
+            permitted = gmcrUtil.permittedMoves(decimals[rows], decimals[cols],
+                                                fwdMask, backMask)
 
             # A DM may not move to or from a state they misperceive.
-            # Remove moves to or from misperceived states
-            for state in conflict.feasibles.ordered:
-                if state not in dm.perceived.ordered:
-                    dm.reachability[:, state - 1] = 0
-                    dm.reachability[state - 1, :] = 0
+            perceived = dm.perceived.maskIn(conflict.feasibles)
+            permitted &= perceived[rows] & perceived[cols]
+            dm.reachability[rows[permitted], cols[permitted]] = 1
 
     def reachable(self, dm, stateIdx):
         """List all states reachable by a decisionMaker or coalition from state.
@@ -151,9 +118,10 @@ class RMGenerator:
         conflictData = self.conflict.export_rep()
 
         nodes = []
+        feasYN = self.conflict.feasibles.yn[:]
 
         for stateIdx, stateDec in enumerate(self.conflict.feasibles.decimal):
-            stateYN = self.conflict.feasibles.yn[stateIdx]
+            stateYN = feasYN[stateIdx]
             stateOrd = self.conflict.feasibles.ordered[stateIdx]
             reachable = []
 
@@ -333,11 +301,12 @@ class LogicalSolver(RMGenerator):
             sanctioned = False
             for moveset in otherDMmovesets:
                 state2combinedDec = dec[state1] + sum(moveset)
-                if state2combinedDec not in self.conflict.feasibles.decimal:
+                state2combined = self.conflict.feasibles.indexOf(
+                    state2combinedDec)
+                if state2combined < 0:
                     # move combination would lead to an infeasible state
                     # check next opponent moveset
                     continue
-                state2combined = dec.index(state2combinedDec)
                 if dm.payoffMatrix[state0, state2combined] <= 0:
                     narration += ("Focal DM {0}'s attempt to move to {1} is "
                                   "SIM sanctioned, due to simultaneous moves "
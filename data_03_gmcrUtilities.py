@@ -5,57 +5,1218 @@
 import itertools
 import numpy
 
-bitFlip = {'N': 'Y', 'Y': 'N'}
 
+def _bitCount(x):
+    """Return the number of set bits in the integer x."""
+    return bin(x).count('1')
 
-def reducePatterns(patterns):
-    """Reduce patterns into compact dash notation.
 
-    Effectively a partial implementation of the Quine-McCluskey Algorithm?
+class Pattern:
+    """A set of states, stored as a pair of integer bit masks.
+
+    Equivalent to a single pattern in 'Y,N,-' notation. Bit i of mask is set
+    if option i is specified by the pattern, and bit i of value is set if
+    that option is taken ('Y').
     """
-    for p in patterns:
-        if len(p) != len(patterns[0]):
+
+    __slots__ = ('mask', 'value', 'numOpts')
+
+    def __init__(self, mask, value, numOpts):
+        """Create a new Pattern from its care and value masks."""
+        self.mask = mask
+        self.value = value & mask
+        self.numOpts = numOpts
+
+    @classmethod
+    def fromYnd(cls, ynd):
+        """Create a Pattern from a string in 'Y,N,-' notation."""
+        if not ynd:
+            return cls(0, 0, 0)
+        rev = ynd[::-1]
+        mask = int(rev.replace('Y', '1').replace('N', '1').replace('-', '0'),
+                   2)
+        value = int(rev.replace('Y', '1').replace('N', '0').replace('-', '0'),
+                    2)
+        return cls(mask, value, len(ynd))
+
+    @classmethod
+    def full(cls, numOpts):
+        """Create a Pattern matching every state ('---...')."""
+        return cls(0, 0, numOpts)
+
+    def ynd(self):
+        """Return the Pattern in 'Y,N,-' notation."""
+        out = []
+        for idx in range(self.numOpts):
+            if not (self.mask >> idx) & 1:
+                out.append('-')
+            elif (self.value >> idx) & 1:
+                out.append('Y')
+            else:
+                out.append('N')
+        return ''.join(out)
+
+    def __str__(self):
+        return self.ynd()
+
+    def __repr__(self):
+        return "Pattern('{}')".format(self.ynd())
+
+    def __eq__(self, other):
+        if not isinstance(other, Pattern):
+            return NotImplemented
+        return (self.mask == other.mask and self.value == other.value and
+                self.numOpts == other.numOpts)
+
+    def __hash__(self):
+        return hash((self.mask, self.value, self.numOpts))
+
+    def count(self):
+        """Number of states matched by the Pattern."""
+        return 2**(self.numOpts - _bitCount(self.mask))
+
+    def matches(self, state):
+        """Test if the decimal state is matched by the Pattern."""
+        return state & self.mask == self.value
+
+    def states(self):
+        """List the decimal values of all states matched, in ascending order.
+        """
+        free = ((1 << self.numOpts) - 1) & ~self.mask
+        out = []
+        sub = free
+        while True:
+            out.append(self.value | sub)
+            if sub == 0:
+                break
+            sub = (sub - 1) & free
+        out.reverse()
+        return out
+
+    def intersects(self, other):
+        """Test if any states are matched by both Patterns."""
+        return not self.mask & other.mask & (self.value ^ other.value)
+
+    def contains(self, other):
+        """Test if every state matched by 'other' is matched by this Pattern.
+        """
+        return (self.mask & ~other.mask == 0 and
+                (self.value ^ other.value) & self.mask == 0)
+
+    def intersection(self, other):
+        """Return the Pattern matching states in both, or None if disjoint."""
+        if not self.intersects(other):
+            return None
+        return Pattern(self.mask | other.mask, self.value | other.value,
+                       self.numOpts)
+
+    def subtract(self, other):
+        """Remove the states in Pattern 'other' from this Pattern.
+
+        Returns a list of disjoint Patterns.
+        """
+        if self.numOpts != other.numOpts:
             raise ValueError("Patterns have different lengths.")
+        if self.mask & other.mask & (self.value ^ other.value):
+            # no overlap, so no change.
+            return [self]
+        remaining = []
+        mask = self.mask
+        value = self.value
+        free = other.mask & ~self.mask
+        while free:
+            bit = free & -free
+            free ^= bit
+            remaining.append(Pattern(mask | bit, value | (~other.value & bit),
+                                     self.numOpts))
+            mask |= bit
+            value |= other.value & bit
+        return remaining
+
+    def merge(self, other):
+        """Combine with 'other' if they differ in exactly one position.
+
+        Returns the combined Pattern, or None if they cannot be combined.
+        """
+        diff = ((self.mask ^ other.mask) |
+                (self.mask & other.mask & (self.value ^ other.value)))
+        if diff == 0 or diff & (diff - 1):
+            return None
+        return Pattern(self.mask & ~diff, self.value, self.numOpts)
+
+
+class Predicate:
+    """A compiled condition: a union of Patterns.
+
+    Tests single decimal states, arrays of decimal states, or packed state
+    bit matrices against the condition.
+    """
+
+    __slots__ = ('patterns', '_wide')
+
+    def __init__(self, patterns):
+        """Create a Predicate matching states matched by any of patterns."""
+        self.patterns = _asPatterns(patterns)
+        self._wide = any(pat.mask >> MAX_INT64_OPTIONS
+                         for pat in self.patterns)
+
+    def __repr__(self):
+        return "Predicate({})".format([pat.ynd() for pat in self.patterns])
+
+    def test(self, states):
+        """Test a decimal state, or an array of them.
+
+        Returns a bool for a single state, or a boolean array.
+        """
+        if isinstance(states, (int, numpy.integer)):
+            states = int(states)
+            return any(pat.matches(states) for pat in self.patterns)
+        states = asStates(states)
+        if self._wide and states.dtype != object:
+            states = states.astype(object)
+        result = numpy.zeros(states.shape, dtype=bool)
+        for pat in self.patterns:
+            result |= (states & pat.mask) == pat.value
+        return result
+
+    def testBits(self, bits):
+        """Test each row of a packed state bit matrix (see packStates)."""
+        return matchPatterns(bits, self.patterns)
+
+
+# States of conflicts with more options than this do not fit in an int64.
+# Their decimal values are stored as python ints in object arrays, and bit
+# level operations split them into 64 bit words (see stateWords).
+MAX_INT64_OPTIONS = 63
+
+
+def stateDtype(numOpts):
+    """numpy dtype used to store decimal states with numOpts options."""
+    if numOpts <= MAX_INT64_OPTIONS:
+        return numpy.dtype(numpy.int64)
+    return numpy.dtype(object)
+
+
+def asStates(values, numOpts=None):
+    """Convert values to an array of decimal states.
+
+    The array is int64 if numOpts (or, if not given, the values) fit in
+    it, and an object array of python ints otherwise.
+    """
+    if numOpts is not None:
+        return numpy.asarray(values, dtype=stateDtype(numOpts))
+    if isinstance(values, numpy.ndarray):
+        if values.dtype == numpy.int64 or values.dtype == object:
+            return values
+        if values.dtype == numpy.uint64 and values.size and \
+                values.max() > numpy.iinfo(numpy.int64).max:
+            return values.astype(object)
+    try:
+        return numpy.asarray(values, dtype=numpy.int64)
+    except OverflowError:
+        return numpy.asarray(values, dtype=object)
+
+
+def _rows(array):
+    """View an array as a 2 dimensional array, with one row per state."""
+    if array.ndim == 2:
+        return array
+    return array.reshape(len(array), -1)
+
+
+def stateWords(decimals, numOpts):
+    """Split decimal states into 64 bit words, one row per state.
+
+    Word w holds options 64*w to 64*w + 63, with option i in bit i % 64.
+    """
+    decimals = asStates(decimals).reshape(-1)
+    numWords = max(1, (numOpts + 63) // 64)
+    if decimals.dtype != object and numWords == 1:
+        return decimals.astype('<u8').reshape(-1, 1)
+    words = numpy.zeros((len(decimals), numWords), dtype='<u8')
+    if decimals.dtype != object:
+        words[:, 0] = decimals.astype('<u8')
+        return words
+    for w in range(numWords):
+        words[:, w] = ((decimals >> (64 * w)) & 0xFFFFFFFFFFFFFFFF).astype(
+            numpy.uint64)
+    return words
+
+
+def wordsToStates(words):
+    """Combine 64 bit words into decimal states. Inverse of stateWords."""
+    words = _rows(numpy.asarray(words, dtype=numpy.uint64))
+    if words.shape[1] == 1 and not (words >> numpy.uint64(63)).any():
+        return words[:, 0].astype(numpy.int64)
+    states = numpy.zeros(len(words), dtype=object)
+    for w in range(words.shape[1]):
+        states += words[:, w].astype(object) << (64 * w)
+    return states
+
+
+class StateArray:
+    """A read-only sorted list of states, backed by a typed numpy array.
+
+    Items are returned as python ints, and membership tests and index lookups
+    use a binary search.
+    """
+
+    __slots__ = ('array',)
+
+    def __init__(self, values=()):
+        """Wrap a sorted sequence of integer states."""
+        self.array = asStates(values).reshape(-1)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return StateArray(self.array[key])
+        return int(self.array[key])
+
+    def __iter__(self):
+        return iter(self.array.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.array
+        return self.array.astype(dtype)
+
+    def __repr__(self):
+        return 'StateArray({})'.format(self.array.tolist())
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return numpy.array_equal(self.array, numpy.asarray(other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def _find(self, state):
+        """Position of state in the array, or -1 if it is not present."""
+        if not isinstance(state, (int, numpy.integer)):
+            return -1
+        idx = int(numpy.searchsorted(self.array, state))
+        if idx < len(self.array) and self.array[idx] == state:
+            return idx
+        return -1
+
+    def __contains__(self, state):
+        return self._find(state) >= 0
+
+    def index(self, state):
+        """Standard list index behaviour."""
+        idx = self._find(state)
+        if idx < 0:
+            raise ValueError("{} is not in list".format(state))
+        return idx
+
+    def tolist(self):
+        """Return the states as a list of python ints."""
+        return self.array.tolist()
+
+
+class StateMap:
+    """A read-only mapping between two aligned arrays of states.
+
+    Used for the decimal -> ordered and ordered -> decimal translations of a
+    FeasibleList without building a dictionary entry per state.
+    """
+
+    __slots__ = ('source', 'target')
+
+    def __init__(self, source, target):
+        """Map each item in source to the item at the same position in target.
+        """
+        source = asStates(source)
+        target = asStates(target)
+        if len(source) > 1 and not (source[1:] > source[:-1]).all():
+            order = numpy.argsort(source, kind='mergesort')
+            source = source[order]
+            target = target[order]
+        self.source = source
+        self.target = target
+
+    def __len__(self):
+        return len(self.source)
+
+    def __iter__(self):
+        return iter(self.source.tolist())
+
+    def _find(self, key):
+        if not isinstance(key, (int, numpy.integer)):
+            return -1
+        idx = int(numpy.searchsorted(self.source, key))
+        if idx < len(self.source) and self.source[idx] == key:
+            return idx
+        return -1
+
+    def __getitem__(self, key):
+        idx = self._find(key)
+        if idx < 0:
+            raise KeyError(key)
+        return int(self.target[idx])
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def get(self, key, default=None):
+        """Standard dict get behaviour."""
+        idx = self._find(key)
+        if idx < 0:
+            return default
+        return int(self.target[idx])
+
+    def keys(self):
+        """Standard dict keys behaviour."""
+        return self.source.tolist()
+
+    def values(self):
+        """Standard dict values behaviour."""
+        return self.target.tolist()
+
+    def items(self):
+        """Standard dict items behaviour."""
+        return zip(self.source.tolist(), self.target.tolist())
+
+    def lookup(self, keys):
+        """Translate an array of keys at once. Raises KeyError if any of the
+        keys are not in the mapping.
+        """
+        keys = asStates(keys)
+        idx = numpy.searchsorted(self.source, keys)
+        idx[idx == len(self.source)] = 0
+        if len(keys) and (len(self.source) == 0 or
+                          (self.source[idx] != keys).any()):
+            raise KeyError("States not in mapping.")
+        return self.target[idx]
+
+
+class StateIndex:
+    """Constant-time lookup of the position of states in a sorted array.
+
+    Uses a dense table over the whole state space when it has at most
+    DENSE_LIMIT entries and is small (at most DENSE_MIN entries) or at most
+    DENSE_RATIO times the number of states, and a binary search of the
+    states otherwise.
+    """
+
+    DENSE_LIMIT = 2**22
+    DENSE_MIN = 2**12
+    DENSE_RATIO = 16
+
+    __slots__ = ('states', 'table')
+
+    def __init__(self, states, numOpts):
+        """Index the sorted array of decimal states."""
+        self.states = asStates(states)
+        size = 2**numOpts
+        if size <= self.DENSE_LIMIT and (
+                size <= max(self.DENSE_MIN,
+                            self.DENSE_RATIO * len(self.states))):
+            self.table = numpy.full(2**numOpts, -1, dtype=numpy.int64)
+            self.table[self.states] = numpy.arange(len(self.states))
+        else:
+            self.table = None
+
+    def find(self, states):
+        """Position of each of the states, or -1 where a state is missing.
+
+        states may be a single decimal state or an array of them.
+        """
+        isScalar = numpy.ndim(states) == 0
+        if isScalar and self.table is not None:
+            if 0 <= states < len(self.table):
+                return int(self.table[states])
+            return -1
+        states = numpy.atleast_1d(asStates(states))
+        if self.table is not None:
+            valid = (states >= 0) & (states < len(self.table))
+            idx = numpy.where(valid,
+                              self.table[numpy.where(valid, states, 0)], -1)
+        elif len(self.states) == 0:
+            idx = numpy.full(states.shape, -1, dtype=numpy.int64)
+        else:
+            idx = numpy.searchsorted(self.states, states)
+            idx[idx == len(self.states)] = 0
+            idx = numpy.where(self.states[idx] == states, idx, -1)
+        if isScalar:
+            return int(idx[0])
+        return idx
+
+    def __contains__(self, state):
+        return self.find(state) >= 0
+
+
+BDD_MIN_OPTIONS = 30
+
+
+class BDD:
+    """Manager for reduced ordered binary decision diagrams over options.
+
+    Nodes are integers indexing the manager's tables; 0 and 1 are the empty
+    and full terminals. The highest option is tested first, so that taking
+    the 'not taken' branch first visits states in increasing decimal order.
+    Operations are memoized, and equal sets always have the same node.
+    """
+
+    def __init__(self, numOpts):
+        """Create a manager for sets of states over numOpts options."""
+        self.numOpts = numOpts
+        self._opt = [-1, -1]
+        self._low = [0, 1]
+        self._high = [0, 1]
+        self._unique = {}
+        self._applyMemo = {}
+        self._countMemo = {0: 0, 1: 1}
+
+    def _node(self, opt, low, high):
+        """Find or create the node testing opt with the given branches."""
+        if low == high:
+            return low
+        key = (opt, low, high)
+        node = self._unique.get(key)
+        if node is None:
+            node = len(self._opt)
+            self._opt.append(opt)
+            self._low.append(low)
+            self._high.append(high)
+            self._unique[key] = node
+        return node
+
+    def _branches(self, node, opt):
+        """Low and high branches of node for option opt."""
+        if self._opt[node] == opt:
+            return self._low[node], self._high[node]
+        return node, node
+
+    def _apply(self, op, u, v):
+        """Combine two nodes with op: 'and', 'or', or 'diff' (u and not v)."""
+        if op == 'and':
+            if u == 0 or v == 0:
+                return 0
+            if u == 1 or u == v:
+                return v
+            if v == 1:
+                return u
+        elif op == 'or':
+            if u == 1 or v == 1:
+                return 1
+            if u == 0 or u == v:
+                return v
+            if v == 0:
+                return u
+        else:
+            if u == 0 or v == 1 or u == v:
+                return 0
+            if v == 0:
+                return u
+        if op != 'diff' and v < u:
+            u, v = v, u
+        key = (op, u, v)
+        result = self._applyMemo.get(key)
+        if result is None:
+            opt = max(self._opt[u], self._opt[v])
+            uLow, uHigh = self._branches(u, opt)
+            vLow, vHigh = self._branches(v, opt)
+            result = self._node(opt, self._apply(op, uLow, vLow),
+                                self._apply(op, uHigh, vHigh))
+            self._applyMemo[key] = result
+        return result
+
+    def _count(self, node):
+        """Count the assignments of options 0 to opt(node) in node."""
+        result = self._countMemo.get(node)
+        if result is None:
+            opt = self._opt[node]
+            low = self._low[node]
+            high = self._high[node]
+            result = (self._count(low) * 2**(opt - 1 - self._opt[low]) +
+                      self._count(high) * 2**(opt - 1 - self._opt[high]))
+            self._countMemo[node] = result
+        return result
+
+    def clearCache(self):
+        """Forget memoized operations. Existing nodes remain valid."""
+        self._applyMemo = {}
+
+    def empty(self):
+        """The set with no states."""
+        return StateSet(self, 0)
+
+    def full(self):
+        """The set of all states."""
+        return StateSet(self, 1)
+
+    def fromPatterns(self, patterns):
+        """The set of states matched by any of the patterns."""
+        node = 0
+        for pat in _asPatterns(patterns):
+            if pat.numOpts != self.numOpts:
+                raise ValueError("Pattern has the wrong number of options.")
+            cube = 1
+            for opt in range(self.numOpts):
+                bit = 1 << opt
+                if pat.mask & bit:
+                    if pat.value & bit:
+                        cube = self._node(opt, 0, cube)
+                    else:
+                        cube = self._node(opt, cube, 0)
+            node = self._apply('or', node, cube)
+        return StateSet(self, node)
+
+
+class StateSet:
+    """A set of states, stored as a node of a BDD manager.
+
+    Supports union, intersection, difference, counting and iteration
+    without listing the states.
+    """
+
+    __slots__ = ('bdd', 'node')
+
+    def __init__(self, bdd, node):
+        """The set of states represented by node in the manager bdd."""
+        self.bdd = bdd
+        self.node = node
+
+    @property
+    def numOpts(self):
+        return self.bdd.numOpts
+
+    def _combine(self, op, other):
+        if other.bdd is not self.bdd:
+            raise ValueError("State sets are from different managers.")
+        return StateSet(self.bdd, self.bdd._apply(op, self.node, other.node))
+
+    def union(self, other):
+        """States in either set."""
+        return self._combine('or', other)
+
+    def intersection(self, other):
+        """States in both sets."""
+        return self._combine('and', other)
+
+    def difference(self, other):
+        """States in this set but not in other."""
+        return self._combine('diff', other)
+
+    def isEmpty(self):
+        return self.node == 0
+
+    def count(self):
+        """Number of states in the set."""
+        bdd = self.bdd
+        return (bdd._count(self.node) *
+                2**(bdd.numOpts - 1 - bdd._opt[self.node]))
+
+    def patterns(self):
+        """Disjoint Patterns matching exactly the states in the set.
+
+        One pattern per path through the diagram.
+        """
+        bdd = self.bdd
+        result = []
+        stack = [(self.node, 0, 0)]
+        while stack:
+            node, mask, value = stack.pop()
+            if node == 0:
+                continue
+            if node == 1:
+                result.append(Pattern(mask, value, bdd.numOpts))
+                continue
+            bit = 1 << bdd._opt[node]
+            # high branch pushed first so the low branch is visited first.
+            stack.append((bdd._high[node], mask | bit, value | bit))
+            stack.append((bdd._low[node], mask | bit, value))
+        return result
+
+    def states(self):
+        """Sorted array of the decimal states in the set."""
+        return patternStates(self.patterns())
+
+    def __iter__(self):
+        """Iterate over the decimal states in increasing order."""
+        bdd = self.bdd
+        stack = [(self.node, bdd.numOpts - 1, 0)]
+        while stack:
+            node, opt, value = stack.pop()
+            if node == 0:
+                continue
+            if node == 1:
+                # all remaining options are free.
+                yield from range(value, value + (1 << (opt + 1)))
+                continue
+            if bdd._opt[node] == opt:
+                low, high = bdd._low[node], bdd._high[node]
+            else:
+                low = high = node
+            stack.append((high, opt - 1, value | (1 << opt)))
+            stack.append((low, opt - 1, value))
+
+    def __eq__(self, other):
+        if not isinstance(other, StateSet):
+            return NotImplemented
+        return self.bdd is other.bdd and self.node == other.node
+
+    def __hash__(self):
+        return hash((id(self.bdd), self.node))
+
+
+class LazyList:
+    """A read-only list whose items are generated only when accessed."""
+
+    __slots__ = ('func', 'length', 'batch')
+
+    def __init__(self, func, length, batch=None):
+        """Item i of the list will be func(i).
+
+        batch (optional) generates the items for an array of indexes at once,
+        and is used when slicing or iterating.
+        """
+        self.func = func
+        self.length = length
+        self.batch = batch
 
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if self.batch is not None:
+                return self.batch(numpy.arange(*key.indices(self.length)))
+            return [self.func(i) for i in range(*key.indices(self.length))]
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("list index out of range")
+        return self.func(key)
+
+    def __iter__(self):
+        if self.batch is not None:
+            return iter(self[:])
+        return (self.func(i) for i in range(self.length))
+
+
+def _asPatterns(patterns):
+    """Convert YND strings to Patterns. Pattern objects are passed through."""
+    return [Pattern.fromYnd(p) if isinstance(p, str) else p for p in patterns]
+
+
+def _isYnd(patterns):
+    """Check if a list of patterns was given in YND string form."""
+    return any(isinstance(p, str) for p in patterns)
+
+
+def _countUnmatched(cubes, numVars, memo):
+    """Count the assignments of numVars variables matched by none of cubes.
+
+    cubes is a frozenset of (mask, value) pairs over those variables. Groups
+    of cubes sharing no variables are counted separately and multiplied;
+    otherwise the most used variable is split on.
+    """
+    if not cubes:
+        return 2**numVars
+    if any(mask == 0 for mask, value in cubes):
+        return 0
+    key = (cubes, numVars)
+    if key in memo:
+        return memo[key]
+
+    # split into groups of cubes that share no variables.
+    groups = []
+    for cube in cubes:
+        merged = [cube]
+        mergedMask = cube[0]
+        for group in groups[:]:
+            if group[0] & mergedMask:
+                groups.remove(group)
+                merged += group[1]
+                mergedMask |= group[0]
+        groups.append((mergedMask, merged))
+
+    if len(groups) > 1:
+        result = 2**(numVars - sum(_bitCount(m) for m, g in groups))
+        for groupMask, group in groups:
+            result *= _countUnmatched(frozenset(group), _bitCount(groupMask),
+                                      memo)
+    else:
+        counts = {}
+        for mask, value in cubes:
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                counts[bit] = counts.get(bit, 0) + 1
+        bit = max(counts, key=counts.get)
+        result = 0
+        for val in (0, bit):
+            cofactor = frozenset((m & ~bit, v & ~bit) for m, v in cubes
+                                 if not m & bit or v & bit == val)
+            result += _countUnmatched(cofactor, numVars - 1, memo)
+    memo[key] = result
+    return result
+
+
+def countStates(patterns):
+    """Count the states matched by a list of possibly overlapping patterns.
+
+    Works on the patterns alone, without expanding them into states.
+    """
+    patterns = _asPatterns(patterns)
+    if not patterns:
+        return 0
+    cubes = frozenset((p.mask, p.value) for p in patterns)
+    usedMask = 0
+    for mask, value in cubes:
+        usedMask |= mask
+    numVars = _bitCount(usedMask)
+    unmatched = _countUnmatched(cubes, numVars, {})
+    return (2**numVars - unmatched) * 2**(patterns[0].numOpts - numVars)
+
+
+def countNewStates(pattern, previous):
+    """Count the states matched by pattern but by none of the previous ones.
+
+    Used for the number of states removed by a condition, given the
+    conditions applied before it.
+    """
+    pattern = _asPatterns([pattern])[0]
+    cofactors = frozenset((p.mask & ~pattern.mask, p.value & ~pattern.mask)
+                          for p in _asPatterns(previous)
+                          if p.intersects(pattern))
+    freeVars = pattern.numOpts - _bitCount(pattern.mask)
+    return _countUnmatched(cofactors, freeVars, {})
+
+
+def sameStates(patternsA, patternsB):
+    """Test if two lists of patterns match exactly the same states."""
+    patternsA = _asPatterns(patternsA)
+    patternsB = _asPatterns(patternsB)
+    if not patternsA or not patternsB:
+        return not patternsA and not patternsB
+    if patternsA[0].numOpts != patternsB[0].numOpts:
+        return False
+    return (countStates(patternsA) == countStates(patternsB) and
+            all(_covered(p, patternsB) for p in patternsA))
+
+
+def complementPatterns(patterns, numOpts=None):
+    """Return patterns matching every state not matched by 'patterns'."""
+    patterns = _asPatterns(patterns)
+    if numOpts is None:
+        numOpts = patterns[0].numOpts
+    remaining = [Pattern.full(numOpts)]
+    for pat in patterns:
+        remaining = [rem for r in remaining for rem in r.subtract(pat)]
+    return remaining
+
+
+def _expand(cube, offSet):
+    """Drop literals from cube for as long as it stays clear of the offSet.
+    """
+    mask = cube.mask
+    value = cube.value
+    blocking = [(off.mask, off.value) for off in offSet]
+    literals = mask
+    while literals:
+        bit = literals & -literals
+        literals ^= bit
+        newMask = mask & ~bit
+        for offMask, offValue in blocking:
+            if not newMask & offMask & (value ^ offValue):
+                break
+        else:
+            mask = newMask
+    return Pattern(mask, value, cube.numOpts)
+
+
+def _covered(cube, cover):
+    """Test if cube is entirely matched by the patterns in cover."""
+    # overlaps as (literals, mask, value), on plain ints for speed.
+    cubeMask = cube.mask
+    cubeValue = cube.value
+    overlaps = []
+    for pat in cover:
+        if not cubeMask & pat.mask & (cubeValue ^ pat.value):
+            mask = cubeMask | pat.mask
+            overlaps.append((_bitCount(mask), mask, cubeValue | pat.value))
+    # not enough overlapping states to match the whole cube.
+    free = cube.numOpts - _bitCount(cubeMask)
+    if sum(2**(cube.numOpts - lits) for lits, m, v in overlaps) < 2**free:
+        return False
+    overlaps.sort(key=lambda o: o[0])
+    remaining = [(cubeMask, cubeValue)]
+    for lits, patMask, patValue in overlaps:
+        nextRemaining = []
+        for mask, value in remaining:
+            if mask & patMask & (value ^ patValue):
+                nextRemaining.append((mask, value))
+                continue
+            # split off the parts of the fragment outside the pattern.
+            bits = patMask & ~mask
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                nextRemaining.append((mask | bit,
+                                      value | (~patValue & bit)))
+                mask |= bit
+                value |= patValue & bit
+        remaining = nextRemaining
+        if not remaining:
+            return True
+    return False
+
+
+def reducePatterns(patterns, offSet=None):
+    """Reduce patterns into compact dash notation.
+
+    An Espresso-style two-level minimization: each pattern is expanded into
+    a prime implicant (as many dashes as possible without matching any state
+    in the offSet), then patterns that are redundant with the rest of the
+    cover are dropped.
+
+    patterns: list of YND strings or Pattern objects. Returned in the same
+        form.
+    offSet (optional): Patterns matching exactly the states not matched by
+        'patterns'. Calculated if not given.
+    """
     if type(patterns) is not list:
         raise TypeError("Patterns must be provided as a list.")
 
-    newPatterns = []
-    matched = []
-    for x, p1 in enumerate(patterns):
-        if x in matched:
+    asYnd = _isYnd(patterns)
+    patterns = _asPatterns(patterns)
+    for p in patterns:
+        if p.numOpts != patterns[0].numOpts:
+            raise ValueError("Patterns have different lengths.")
+    if not patterns:
+        return []
+    if offSet is None:
+        offSet = complementPatterns(patterns)
+    else:
+        offSet = _asPatterns(offSet)
+
+    cover = _minimize(patterns, offSet)
+    if asYnd:
+        return [p.ynd() for p in cover]
+    return cover
+
+
+def _minimize(patterns, offSet, new=None):
+    """Expand patterns into primes, then drop the redundant ones.
+
+    new: indexes of the patterns that need expanding, or None for all of
+        them. The other patterns must be primes that were irredundant among
+        themselves; they are kept unless a new prime contains or covers
+        them, so the work grows with the number of new patterns rather
+        than with pairs of patterns in the cover.
+    """
+    if not patterns:
+        return []
+    if new is None:
+        new = range(len(patterns))
+    new = set(new)
+    numOpts = patterns[0].numOpts
+    # slot i holds pattern i, or its prime once expanded; the containment
+    # and overlap tests against the cover are made on all slots at once.
+    slots = list(patterns)
+    masks = asStates([p.mask for p in patterns], numOpts)
+    values = asStates([p.value for p in patterns], numOpts)
+    inCover = numpy.zeros(len(patterns), bool)
+    isPrime = numpy.zeros(len(patterns), bool)
+    order = []
+
+    def containing(cube):
+        return ((masks & ~cube.mask) == 0) & \
+            (((values ^ cube.value) & masks) == 0)
+
+    # EXPAND: largest patterns first, so that smaller ones are likely to be
+    # absorbed by the time they are reached.
+    for idx in sorted(range(len(patterns)),
+                      key=lambda i: _bitCount(patterns[i].mask)):
+        cube = patterns[idx]
+        if idx not in new:
+            if not (containing(cube) & inCover & isPrime).any():
+                inCover[idx] = True
+                order.append(idx)
             continue
-        for y, p2 in enumerate(patterns[x + 1:], 1):
-            if x + y in matched:
-                continue
-            diffs = 0
-            for idx, bit in enumerate(zip(p1, p2)):
-                if bit[0] != bit[1]:
-                    diffs += 1
-                    dbit = idx
-                if diffs > 1:
-                    break
-            if diffs == 1:
-                newPatterns.append(p1[:dbit] + '-' + p1[dbit + 1:])
-                matched += [x, x + y]
-                break
-        if x not in matched:
-            newPatterns.append(p1)
-    if matched:
-        newPatterns = reducePatterns(newPatterns)
-    return newPatterns
+        if (containing(cube) & inCover).any():
+            continue
+        prime = _expand(cube, offSet)
+        slots[idx] = prime
+        masks[idx] = prime.mask
+        values[idx] = prime.value
+        inCover &= ((prime.mask & ~masks) != 0) | \
+            (((values ^ prime.value) & prime.mask) != 0)
+        inCover[idx] = True
+        isPrime[idx] = True
+        order.append(idx)
+
+    # IRREDUNDANT: drop patterns matched by the rest of the cover, checking
+    # the smallest patterns first. Only the new primes and the patterns
+    # they overlap can have become redundant.
+    if len(new) == len(patterns):
+        check = inCover.copy()
+    else:
+        check = inCover & isPrime
+        for idx in numpy.flatnonzero(inCover & isPrime):
+            check |= inCover & ((masks & slots[idx].mask &
+                                 (values ^ slots[idx].value)) == 0)
+    for idx in sorted(numpy.flatnonzero(check).tolist(),
+                      key=lambda i: -_bitCount(slots[i].mask)):
+        cube = slots[idx]
+        overlap = inCover & ((masks & cube.mask & (values ^ cube.value)) == 0)
+        overlap[idx] = False
+        if _covered(cube, [slots[i] for i in numpy.flatnonzero(overlap)]):
+            inCover[idx] = False
+    return [slots[idx] for idx in order if inCover[idx]]
 
 
 def expandPatterns(patterns):
     """Expand patterns so that they contain no dashes."""
     newPatterns = []
+    for pat in _asPatterns(patterns):
+        newPatterns += dec2ynArray(pat.states(), pat.numOpts).tolist()
+    return newPatterns
+
+
+def patternStates(patterns):
+    """Return a sorted array of the decimal states matched by the patterns.
+
+    Each pattern is expanded with numpy, so the cost is proportional to the
+    number of states matched rather than to the full state space.
+    """
+    patterns = _asPatterns(patterns)
+    if not patterns:
+        return numpy.zeros(0, numpy.int64)
+    dtype = stateDtype(patterns[0].numOpts)
+    parts = []
     for pat in patterns:
-        if '-' in pat:
-            adding = [pat.replace('-', 'Y', 1), pat.replace('-', 'N', 1)]
-            newPatterns += expandPatterns(adding)
+        freeBits = [idx for idx in range(pat.numOpts)
+                    if not (pat.mask >> idx) & 1]
+        counter = numpy.arange(2**len(freeBits), dtype=numpy.int64)
+        states = numpy.full(len(counter), pat.value, dtype)
+        for pos, idx in enumerate(freeBits):
+            states |= ((counter >> pos) & 1).astype(dtype) << idx
+        parts.append(states)
+    states = numpy.sort(numpy.concatenate(parts))
+    # patterns may overlap, so drop repeated states.
+    keep = numpy.ones(len(states), bool)
+    keep[1:] = states[1:] != states[:-1]
+    return states[keep]
+
+
+def filterStates(states, include=None, exclude=()):
+    """Return the states in a sorted array that pass the given conditions.
+
+    include: Patterns, one of which must be matched. None to match all.
+    exclude: Patterns (eg. infeasible conditions) which must not be matched.
+    """
+    states = asStates(states)
+    include = None if include is None else _asPatterns(include)
+    exclude = _asPatterns(exclude)
+    if include is None:
+        keep = numpy.ones(len(states), bool)
+    else:
+        keep = numpy.zeros(len(states), bool)
+        for pat in include:
+            keep |= (states & pat.mask) == pat.value
+    for pat in exclude:
+        keep &= (states & pat.mask) != pat.value
+    return states[keep]
+
+
+def _groupStates(decimals, focalMask, otherMask):
+    """Group states that agree on the options in otherMask.
+
+    States taking options outside focalMask | otherMask are left out.
+    Returns (members, starts, sizes): the indexes in decimals of the
+    grouped states, ascending within each group, and the position in
+    members and the size of each group.
+    """
+    decimals = asStates(decimals)
+    valid = numpy.flatnonzero((decimals & ~(focalMask | otherMask)) == 0)
+    keys = decimals[valid] & otherMask
+    order = numpy.argsort(keys, kind='stable')
+    members = valid[order]
+    keys = keys[order]
+    newGroup = numpy.ones(len(keys), bool)
+    newGroup[1:] = keys[1:] != keys[:-1]
+    starts = numpy.flatnonzero(newGroup)
+    sizes = numpy.diff(numpy.append(starts, len(keys)))
+    return members, starts, sizes
+
+
+def reachabilityEdges(decimals, focalMask, otherMask):
+    """Moves between states made by changing only the focal options.
+
+    decimals: an array of states. States that agree on the options in
+    otherMask and take no options outside focalMask | otherMask are
+    mutually reachable, by changing the options in focalMask.
+    Returns arrays (rows, cols), the indexes in decimals of every ordered
+    pair of distinct, mutually reachable states. The work done is
+    proportional to the number of states and pairs.
+    """
+    members, starts, sizes = _groupStates(decimals, focalMask, otherMask)
+
+    # size and start (in members) of the group holding each member.
+    groupSize = numpy.repeat(sizes, sizes)
+    groupStart = numpy.repeat(starts, sizes)
+
+    # pair each member with every member of its group.
+    rows = numpy.repeat(numpy.arange(len(members)), groupSize)
+    offsets = numpy.arange(len(rows)) - numpy.repeat(
+        numpy.cumsum(groupSize) - groupSize, groupSize)
+    cols = numpy.repeat(groupStart, groupSize) + offsets
+    distinct = rows != cols
+    return members[rows[distinct]], members[cols[distinct]]
+
+
+def permittedMoves(fromStates, toStates, fwdMask=0, backMask=0):
+    """Boolean mask of the moves respecting irreversible options.
+
+    A move from fromStates[i] to toStates[i] is forbidden if it takes an
+    option in fwdMask from Y to N, or an option in backMask from N to Y.
+    """
+    fromStates = asStates(fromStates)
+    toStates = asStates(toStates)
+    against = (fromStates & fwdMask) | (~fromStates & backMask)
+    return ((fromStates ^ toStates) & against) == 0
+
+
+class ImplicitReachability:
+    """Moves available to one DM, answered without a reachability matrix.
+
+    Feasible states are grouped by the options the DM does not control;
+    a state can reach the other members of its group, less moves against
+    irreversible options (fwdMask, backMask) and moves to or from states
+    outside the perceived mask. Memory is linear in the number of
+    states and a lookup costs the size of the state's group.
+    """
+
+    __slots__ = ('decimals', 'members', 'start', 'stop', 'fwdMask',
+                 'backMask')
+
+    def __init__(self, decimals, focalMask, otherMask, fwdMask=0,
+                 backMask=0, perceived=None):
+        """Index the states in decimals for a DM controlling focalMask."""
+        self.decimals = asStates(decimals)
+        self.fwdMask = fwdMask
+        self.backMask = backMask
+        # misperceived states are left out, so they neither reach nor
+        # are reached.
+        if perceived is None:
+            seen = numpy.arange(len(self.decimals))
         else:
-            newPatterns += [pat]
-    return newPatterns
+            seen = numpy.flatnonzero(perceived)
+        members, starts, sizes = _groupStates(self.decimals[seen],
+                                              focalMask, otherMask)
+        members = seen[members]
+        self.start = numpy.zeros(len(self.decimals), numpy.int64)
+        self.stop = numpy.zeros(len(self.decimals), numpy.int64)
+        self.start[members] = numpy.repeat(starts, sizes)
+        self.stop[members] = numpy.repeat(starts + sizes, sizes)
+        self.members = members
+
+    def reachable(self, stateIdx):
+        """Ascending array of the states reachable from stateIdx."""
+        group = self.members[self.start[stateIdx]:self.stop[stateIdx]]
+        group = group[group != stateIdx]
+        if self.fwdMask or self.backMask:
+            # a one-state slice keeps the dtype of the decimals, where
+            # indexing would give a python int too large for int64.
+            state = self.decimals[stateIdx:stateIdx + 1]
+            group = group[permittedMoves(state, self.decimals[group],
+                                         self.fwdMask, self.backMask)]
+        return group
+
+    def __len__(self):
+        return len(self.decimals)
+
+
+def enumerateStates(numOpts, include=None, exclude=(), chunkSize=2**20):
+    """Return a sorted array of all states passing the given conditions.
+
+    Scans the full state space (0 to 2**numOpts - 1) in chunks; see
+    filterStates for the meaning of include and exclude.
+    """
+    include = None if include is None else _asPatterns(include)
+    exclude = _asPatterns(exclude)
+    total = 2**numOpts
+    chunks = []
+    for start in range(0, total, chunkSize):
+        states = numpy.arange(start, min(start + chunkSize, total),
+                              dtype=numpy.int64)
+        chunks.append(filterStates(states, include, exclude))
+    if not chunks:
+        return numpy.zeros(0, numpy.int64)
+    return numpy.concatenate(chunks)
+
+
+def packStates(decimals, numOpts):
+    """Convert decimal states into a packed state x option bit matrix.
+
+    Returns a uint8 array with one row per state. Option i is stored in bit
+    (i % 8) of byte (i // 8), matching numpy.unpackbits(bitorder='little').
+    """
+    words = numpy.ascontiguousarray(stateWords(decimals, numOpts))
+    numBytes = (numOpts + 7) // 8
+    return words.view(numpy.uint8)[:, :numBytes].copy()
+
+
+def unpackStates(bits):
+    """Convert a packed state x option bit matrix into decimal states.
+
+    Inverse of packStates.
+    """
+    bits = _rows(numpy.asarray(bits, dtype=numpy.uint8))
+    numWords = max(1, (bits.shape[1] + 7) // 8)
+    padded = numpy.zeros((len(bits), 8 * numWords), dtype=numpy.uint8)
+    padded[:, :bits.shape[1]] = bits
+    return wordsToStates(padded.view('<u8'))
+
+
+def matchPatterns(bits, patterns):
+    """Test each row of a packed bit matrix against a group of patterns.
+
+    Returns a boolean array, True for the states (rows of bits, as built by
+    packStates) that match one or more of the patterns.
+    """
+    bits = _rows(numpy.asarray(bits, dtype=numpy.uint8))
+    result = numpy.zeros(len(bits), bool)
+    for pat in _asPatterns(patterns):
+        mask = packStates([pat.mask], pat.numOpts)[0, :bits.shape[1]]
+        value = packStates([pat.value], pat.numOpts)[0, :bits.shape[1]]
+        result |= ((bits & mask) == value).all(axis=1)
+    return result
+
+
+def yn2decArray(ynStates):
+    """Convert a sequence of YN strings into an array of decimal states."""
+    ynStates = list(ynStates)
+    if not ynStates:
+        return numpy.zeros(0, dtype=numpy.int64)
+    numOpts = len(ynStates[0])
+    if any(len(st) != numOpts for st in ynStates):
+        raise ValueError("States have different lengths.")
+    chars = numpy.frombuffer(''.join(ynStates).encode('ascii'),
+                             dtype=numpy.uint8).reshape(-1, numOpts)
+    return unpackStates(numpy.packbits(chars == ord('Y'), axis=1,
+                                       bitorder='little'))
+
+
+def dec2ynArray(decimals, numOpts):
+    """Convert an array of decimal states into an array of YN strings."""
+    bits = packStates(decimals, numOpts)
+    if numOpts == 0:
+        return numpy.array([''] * len(bits))
+    bits = numpy.unpackbits(bits, axis=1, bitorder='little')[:, :numOpts]
+    chars = numpy.where(bits, ord('Y'), ord('N')).astype(numpy.uint8)
+    return chars.view('S{}'.format(numOpts)).ravel().astype(
+        'U{}'.format(numOpts))
 
 
 def yn2dec(ynState):
@@ -80,50 +1241,72 @@ def _subtractPattern(feas, sub):
     """Remove infeasible condition 'sub' from feasible condition 'feas'."""
     if len(feas) != len(sub):
         raise ValueError("Patterns have different lengths.")
-    sub = [x for x in enumerate(sub) if x[1] != '-']
-    # check if targ overlaps with state:
-    for x in sub:
-        idx, val = x
-        if feas[idx] == bitFlip[val]:  # if no overlap then no change,
-            return [feas]              # and return the same feasible condition
-    # subtract overlap if it exists
-    remainingStates = []
-    curr = feas
-    for x in sub:
-        idx, val = x
-        if curr[idx] == '-':
-            remainingStates.append(curr[:idx] + bitFlip[val] + curr[idx + 1:])
-            curr = curr[:idx] + val + curr[idx + 1:]
-    return remainingStates
-
-
-def rmvSt(feas, rmv):
+    return [p.ynd() for p in
+            Pattern.fromYnd(feas).subtract(Pattern.fromYnd(sub))]
+
+
+def rmvSt(feas, rmv, offSet=None):
     """Subtract YND 'rmv' from states list of states 'feas'.
 
-    feas: list of YND states.
-    rmv: a single YND state.
-    returns: list feas - rmv, and the number of states removed.
+    feas: list of YND states, or of Patterns, or a StateSet. Lists are
+        expected in the reduced form given by reducePatterns and rmvSt;
+        patterns that rmv does not cut are kept as they are.
+    rmv: a single YND state, or Pattern.
+    offSet (optional): Patterns matching exactly the states not in 'feas'.
+        Saves recalculating them when reducing the result.
+    returns: list feas - rmv, and the number of states removed. The list is
+        given in the same form as rmv, or as a StateSet if feas was one.
     """
-    orig = sum([2**x.count('-') for x in feas])  # Original number of states
+    asYnd = isinstance(rmv, str)
+    if asYnd:
+        rmv = Pattern.fromYnd(rmv)
+    if isinstance(feas, StateSet):
+        newfeas = feas.difference(feas.bdd.fromPatterns([rmv]))
+        return newfeas, feas.count() - newfeas.count()
+    feas = _asPatterns(feas)
+    # patterns clear of rmv are still primes once it is removed, so only
+    # the fragments of the patterns it cuts are minimized again.
     newfeas = []
+    fragments = []
     for pattern in feas:
-        newfeas += _subtractPattern(pattern, rmv)
-    newfeas = reducePatterns(newfeas)
+        if pattern.intersects(rmv):
+            for frag in pattern.subtract(rmv):
+                fragments.append(len(newfeas))
+                newfeas.append(frag)
+        else:
+            newfeas.append(pattern)
     # number of states removed
-    numRmvd = orig - sum([2**x.count('-') for x in newfeas])
+    if offSet is not None:
+        offSet = _asPatterns(offSet)
+        numRmvd = countNewStates(rmv, offSet)
+        offSet = offSet + [rmv]
+    else:
+        numRmvd = countStates([p.intersection(rmv) for p in feas
+                               if p.intersects(rmv)])
+    if offSet is None:
+        offSet = complementPatterns(newfeas, rmv.numOpts)
+    newfeas = _minimize(newfeas, offSet, fragments)
+    if asYnd:
+        newfeas = [p.ynd() for p in newfeas]
     return newfeas, numRmvd
 
 
 def subtractStateSets(originalStates, statesToRemove):
     """Return the originalStates minus the statesToRemove.
 
-    originalStates: list of YND states.
-    statesToRemove: list of YND states.
+    originalStates: list of YND states, or of Patterns, or a StateSet.
+    statesToRemove: list of YND states, or of Patterns.
     """
-    newStates = reducePatterns(originalStates)
-    for rmv in reducePatterns(statesToRemove):
+    if isinstance(originalStates, StateSet):
+        bdd = originalStates.bdd
+        return originalStates.difference(bdd.fromPatterns(statesToRemove))
+    asYnd = _isYnd(originalStates) or _isYnd(statesToRemove)
+    newStates = reducePatterns(_asPatterns(originalStates))
+    for rmv in reducePatterns(_asPatterns(statesToRemove)):
         newStates = rmvSt(newStates, rmv)[0]
 
+    if asYnd:
+        return [p.ynd() for p in newStates]
     return newStates
 
 
@@ -132,102 +1315,224 @@ def mutuallyExclusive(mutEx):
     return list(itertools.combinations(mutEx, 2))
 
 
-def orderedNumbers(decimalList):
-    """Create translation dictionaries for using ordered numbers.
+def _describeStates(states, singular, plural, limit=10):
+    """Error message naming some states, eg. 'States 1, 2 are missing.'"""
+    states = sorted(states)
+    if len(states) == 1:
+        return "State {} {}.".format(states[0], singular)
+    names = ", ".join(str(st) for st in states[:limit])
+    if len(states) > limit:
+        names += ", ... ({} in total)".format(len(states))
+    return "States {} {}.".format(names, plural)
+
 
-    Generates the decimal->ordered and ordered->decimal translation
-    dictionaries for a list of decimal values.
+class RankingValidator:
+    """Checks a preference ranking against the feasible states.
+
+    The ranking can be edited with update(), which only re-counts the
+    entries that changed, and errors() then reports every problem found.
     """
-    toOrdered = {}        # decimal -> ordered dictionary
-    toDecimal = {}         # ordered -> decimal dictionary
-    for i, x in enumerate(decimalList, 1):
-        toOrdered[x] = i
-        toDecimal[i] = x
-    return toOrdered, toDecimal
+
+    def __init__(self, prefRank, feasibles):
+        """Check prefRank, a list of ordered states or groups of them."""
+        self.feasibles = feasibles
+        self._valid = set(feasibles.ordered.array.tolist())
+        self._counts = {}
+        self._missing = set(self._valid)
+        self._duplicates = set()
+        self._unknown = {}
+        self.ranking = []
+        self.update(prefRank)
+
+    def _count(self, entry, change):
+        """Add (change=1) or remove (change=-1) a ranking entry's states."""
+        members = entry if isinstance(entry, (list, tuple)) else (entry,)
+        for state in members:
+            if isinstance(state, (int, numpy.integer)) and \
+                    state in self._valid:
+                state = int(state)
+                count = self._counts.get(state, 0) + change
+                self._counts[state] = count
+                if count == 0:
+                    self._missing.add(state)
+                else:
+                    self._missing.discard(state)
+                if count > 1:
+                    self._duplicates.add(state)
+                else:
+                    self._duplicates.discard(state)
+            else:
+                key = str(state)
+                count = self._unknown.get(key, 0) + change
+                if count:
+                    self._unknown[key] = count
+                else:
+                    del self._unknown[key]
+
+    def update(self, prefRank):
+        """Replace the ranking, re-checking only the entries that changed."""
+        if not isinstance(prefRank, list):
+            self._format = False
+            return
+        self._format = True
+        old = self.ranking
+        shortest = min(len(old), len(prefRank))
+        start = 0
+        while start < shortest and old[start] == prefRank[start]:
+            start += 1
+        end = 0
+        while (end < shortest - start and
+               old[len(old) - end - 1] == prefRank[len(prefRank) - end - 1]):
+            end += 1
+        for entry in old[start:len(old) - end]:
+            self._count(entry, -1)
+        for entry in prefRank[start:len(prefRank) - end]:
+            self._count(entry, 1)
+        self.ranking = list(prefRank)
+
+    def errors(self):
+        """All problems with the ranking as a message, or None if valid."""
+        if not self._format:
+            return "Invalid format."
+        messages = []
+        if self._unknown:
+            messages.append(_describeStates(self._unknown,
+                                            "is not a feasible state",
+                                            "are not feasible states"))
+        if self._duplicates:
+            messages.append(_describeStates(self._duplicates,
+                                            "cannot appear more than once",
+                                            "cannot appear more than once"))
+        if self._missing:
+            messages.append(_describeStates(self._missing, "is missing",
+                                            "are missing"))
+        if messages:
+            return " ".join(messages)
+        return None
 
 
 def validatePreferenceRanking(prefRank, feasibles):
-    """Check that the preference ranking given is valid."""
-    alreadySeen = []
-    if not isinstance(prefRank, list):
-        return "Invalid format."
-    for state in prefRank:
-        if state in feasibles.ordered:
-            if state in alreadySeen:
-                return "State {} cannot appear more than once.".format(state)
-            alreadySeen.append(state)
-        else:
-            try:
-                for subSt in state:
-                    if subSt in feasibles.ordered:
-                        if subSt in alreadySeen:
-                            return ("State {} cannot appear more than"
-                                    " once.").format(subSt)
-                        alreadySeen.append(subSt)
-                    else:
-                        return ("State {} is not a feasible "
-                                "state.").format(subSt)
-            except TypeError:
-                return "State {} is not a feasible state".format(state)
+    """Check that the preference ranking given is valid.
+
+    Returns a message describing all problems found, or None if valid.
+    """
+    return RankingValidator(prefRank, feasibles).errors()
+
+
+def _flattenRanking(preferenceRanking):
+    """Flatten a preference ranking into two aligned arrays.
+
+    Returns the ordered states in the ranking, and the position in the
+    ranking of the entry (a state or group of tied states) holding each.
+    """
+    sizes = numpy.array([len(st) if isinstance(st, list) else 1
+                         for st in preferenceRanking], dtype=numpy.int64)
+    states = numpy.fromiter(
+        itertools.chain.from_iterable(st if isinstance(st, list) else (st,)
+                                      for st in preferenceRanking),
+        numpy.int64, int(sizes.sum()))
+    positions = numpy.repeat(numpy.arange(len(sizes)), sizes)
+    return states, positions
 
-    for state in feasibles.ordered:
-        if state not in alreadySeen:
-            return "State {} is missing.".format(state)
 
-    return None
+def _groupRanking(states, positions):
+    """Rebuild a ranking from flattened, position sorted arrays."""
+    ends = numpy.flatnonzero(positions[1:] != positions[:-1]) + 1
+    ranking = []
+    for group in numpy.split(states, ends):
+        if len(group) > 1:
+            ranking.append(group.tolist())
+        elif len(group) == 1:
+            ranking.append(int(group[0]))
+    return ranking
 
 
 def mapPrefRank2Payoffs(preferenceRanking, feasibles):
     """Map the preference rankings into payoff values for each state."""
-    payoffs = numpy.zeros(len(feasibles), numpy.int_)    # clean payoffs array
+    numStates = len(feasibles)
+    states, positions = _flattenRanking(preferenceRanking)
+    unknown = (states < 1) | (states > numStates)
+    if unknown.any():
+        raise ValueError("State {} is not a feasible state.".format(
+            states[unknown][0]))
 
     # use position in preference ranking to give a payoff value.
-    for idx, state in enumerate(preferenceRanking):
-        try:
-            for subState in state:
-                payoffs[subState - 1] = len(feasibles) - idx
-        except TypeError:
-            payoffs[state - 1] = len(feasibles) - idx
-
-    if 0 in payoffs:
-        state = feasibles.ordered[payoffs.index(0)]
-        raise Exception(("Feasible state '%s' for DM was not included in the "
+    payoffs = numpy.zeros(numStates, numpy.int_)
+    payoffs[states - 1] = numStates - positions
+
+    missing = numpy.flatnonzero(payoffs == 0)
+    if len(missing):
+        state = feasibles.ordered[int(missing[0])]
+        raise Exception(("Feasible state '{}' for DM was not included in the "
                          "preference ranking").format(state))
 
     return payoffs
 
 
-def prefPriorities2payoffs(preferences, feasibles):
+def payoffs2PrefRank(payoffs):
+    """Group the states into a preference ranking by their payoffs.
+
+    The inverse of mapPrefRank2Payoffs: most preferred states come first,
+    and states with equal payoffs are tied, in ascending order.
+    """
+    payoffs = numpy.asarray(payoffs)
+    order = numpy.argsort(-payoffs, kind='stable')
+    return _groupRanking(order + 1, payoffs[order])
+
+
+def projectRanking(preferenceRanking, keep):
+    """Restrict a preference ranking to a subset of the states.
+
+    keep is a boolean mask over the states, indexed by ordered number - 1.
+    Groups left with a single state are replaced by that state, and empty
+    groups are dropped.
+    """
+    states, positions = _flattenRanking(preferenceRanking)
+    kept = (states >= 1) & (states <= len(keep))
+    kept[kept] = keep[states[kept] - 1]
+    return _groupRanking(states[kept], positions[kept])
+
+
+def preferenceSatisfaction(preferences, feasibles):
+    """Find which preference statements each feasible state satisfies.
+
+    Returns a packed state x statement bit matrix: statement k is stored in
+    bit (7 - k % 8) of byte k // 8, so the first statement is the highest
+    bit of each row (numpy.unpackbits with the default bitorder='big').
+    """
+    bits = feasibles.bits
+    satisfied = numpy.zeros((len(feasibles), len(preferences)), bool)
+    for idx, preference in enumerate(preferences):
+        satisfied[:, idx] = preference.predicate().testBits(bits)
+    return numpy.packbits(satisfied, axis=1, bitorder='big')
+
+
+def prefPriorities2payoffs(preferences, feasibles, satisfaction=None):
     """Rank the states for a DM, generating payoff values.
 
     Ranking is based on Preference Prioritization, and output payoff values
-    are sequential.
-    """
-    # generate initial payoffs
-    payoffsRaw = numpy.zeros(len(feasibles), numpy.int_)
-    for preference in preferences:
-        for state in feasibles.decimal:
-            if preference.test(state):
-                payoffsRaw[feasibles.toOrdered[state] - 1] += preference.weight
-
-    # Reduce magnitude of payoffs.
-    # Do not do this if weights had special meaning.
-    uniquePayoffs = numpy.unique(payoffsRaw)
-    preferenceRanking = []
-    payoffs = payoffsRaw.copy()  # creates a copy
-
-    for idx, value in enumerate(uniquePayoffs):
-        for jdx, pay in enumerate(payoffsRaw):
-            if pay == value:
-                payoffs[jdx] = idx + 1
-        stateSet = [idx + 1 for idx, pay in enumerate(payoffsRaw)
-                    if pay == value]
-        if len(stateSet) > 1:
-            preferenceRanking.append(stateSet)
-        else:
-            preferenceRanking.append(stateSet[0])
+    are sequential. States are ordered lexicographically by which
+    preference statements they satisfy, earlier statements being more
+    important; the same order that weights of 2**(n - idx - 1) give, without
+    summing them. satisfaction (optional) is the result of
+    preferenceSatisfaction, if already known.
+    """
+    numStates = len(feasibles)
+    if satisfaction is None:
+        satisfaction = preferenceSatisfaction(preferences, feasibles)
+
+    # with the first statement in the highest bit, comparing the byte
+    # columns in turn compares the rows lexicographically.
+    if satisfaction.shape[1]:
+        order = numpy.lexsort(satisfaction.T[::-1])
+    else:
+        order = numpy.arange(numStates)
+    keys = satisfaction[order]
+    newRank = numpy.ones(numStates, bool)
+    newRank[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+    payoffs = numpy.zeros(numStates, numpy.int_)
+    payoffs[order] = numpy.cumsum(newRank)
 
-    # necessary to put most preferred states at beginning instead of end
-    preferenceRanking.reverse()
+    preferenceRanking = payoffs2PrefRank(payoffs)
 
     return payoffs, preferenceRanking
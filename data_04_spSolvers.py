@@ -12,6 +12,7 @@ import scipy.sparse
 import itertools
 import json
 import data_01_conflictModel as model
+import data_03_gmcrUtilities as gmcrUtil
 from tkinter import filedialog
 
 class Preference:
@@ -30,11 +31,16 @@ class RMGenerator:
     uis(dm,state)
     
     Other methods are provided that allow the reachability data to be exported.
+
+    If implicit is True, no matrix is built; each DM's reachability is a
+    gmcrUtil.ImplicitReachability index that finds the moves from a state
+    on demand, using memory linear in the number of feasible states.
     
     """
-    def __init__(self,conflict,useCoalitions=True):
+    def __init__(self,conflict,useCoalitions=True,implicit=False):
 
         self.conflict = conflict
+        self.implicit = implicit
         
         if useCoalitions:
             if len(self.conflict.coalitions) == 0:
@@ -44,8 +50,20 @@ class RMGenerator:
         else:
             self.effectiveDMs = self.conflict.decisionMakers
 
+        feasibles = conflict.feasibles
+        decimals = feasibles.decimal.array
+        numStates = len(feasibles)
+
+        fwdMask = 0
+        backMask = 0
+        for option in conflict.options:
+            if option.permittedDirection == "fwd":
+                fwdMask |= option.dec_val
+            elif option.permittedDirection == "back":
+                backMask |= option.dec_val
+
         for dm in self.effectiveDMs:
-            dm.reachability = scipy.sparse.dok_matrix((len(conflict.feasibles),len(conflict.feasibles)),numpy.int_)
+            dm.calculatePerceived()
             if dm.isCoalition:
                 def closureA(cDM):
                     def payoff(s0,s1):
@@ -54,8 +72,8 @@ class RMGenerator:
                                 return 0
                         return 1
                         
-                    def improvements(s0):
-                        pmTemp = numpy.array([mdm.payoffs-mdm.payoffs[s0] for mdm in cDM])
+                    def improvements(s0,states=slice(None)):
+                        pmTemp = numpy.array([mdm.payoffs[states]-mdm.payoffs[s0] for mdm in cDM])
                         return (pmTemp>0).all(axis=0)
                         
                     return payoff,improvements
@@ -66,54 +84,43 @@ class RMGenerator:
                     def payoff(s0,s1):
                         return (cDM.payoffs[s1] > cDM.payoffs[s0]) * 1
                         
-                    def improvements(s0):
-                        return (cDM.payoffs-cDM.payoffs[s0])>0
+                    def improvements(s0,states=slice(None)):
+                        return (cDM.payoffs[states]-cDM.payoffs[s0])>0
                         
                     return payoff,improvements
                 dm.payoff, dm.improvements = closureB(dm)
 
-            # generate a flat list of move values controlled by other DMs
-
-            otherCOsMoves = [option.dec_val for otherDM in self.effectiveDMs if otherDM!=dm for option in otherDM.options ]
-            focalCOmoves = [option.dec_val for option in dm.options]
-
-            # translate the list of moves values for other DMs into a list of base states
-            fixedStates = [0]
-            for val in otherCOsMoves:
-                fixedStates = [y+z for y in fixedStates for z in [0, val]]
-
-            # translate the list of focal DM move values into a list of focal DM states
-            manipulatedStates = [0]
-            for val in focalCOmoves:
-                manipulatedStates = [y+z for y in manipulatedStates for z in [0, val]]
-
-            # find the full set of mutually reachable states (controlled by the focal DM) for each fixed state (controlled by the other DMs)
-            for state in fixedStates:
-                reachable = [state]     #starting point
-                reachable = [y+z for y in reachable for z in manipulatedStates]   #full reachable set
-                reachable = [y for y in reachable if (y in conflict.feasibles.decimal)]   #remove infeasibles
-
-                for state0 in reachable:    #add one set of mutually reachable states
-                    s0 = self.conflict.feasibles.toOrdered[state0]-1
-                    for state1 in reachable:
-                        s1 = self.conflict.feasibles.toOrdered[state1]-1
-                        if s0 != s1:
-                            dm.reachability[s0,s1] =  1
-
-            # Remove irreversible states ######################################################
-            for option in conflict.options:
-                if option.permittedDirection != "both":
-                    for idx0,state0yn in enumerate(conflict.feasibles.yn):
-                        # does state have potential for irreversible move?
-                        val0 = state0yn[option.master_index]           # value of the irreversible move option in DMs current state (Y/N)
-                        if (val0 == "Y") and (option.permittedDirection == "fwd") or (val0 == "N") and (option.permittedDirection == "back"):
-                            for idx1,state1yn in enumerate(conflict.feasibles.yn):
-                                #does target move have irreversible move?
-                                val1 = state1yn[option.master_index]
-                                if val0 != val1:
-                                #remove irreversible moves from reachability matrix
-                                    dm.reachability[idx0,idx1] = 0
-            dm.reachability = dm.reachability.tocsr()
+            # states that differ only in options controlled by the focal DM
+            # are mutually reachable.
+            otherCOsMask = 0
+            for otherDM in self.effectiveDMs:
+                if otherDM != dm:
+                    for option in otherDM.options:
+                        otherCOsMask |= option.dec_val
+            focalCOmask = 0
+            for option in dm.options:
+                focalCOmask |= option.dec_val
+            # A DM may not move to or from a state they misperceive.
+            perceived = dm.perceived.maskIn(feasibles)
+
+            if implicit:
+                dm.reachability = gmcrUtil.ImplicitReachability(
+                    decimals, focalCOmask, otherCOsMask, fwdMask, backMask,
+                    perceived)
+                continue
+
+            rows, cols = gmcrUtil.reachabilityEdges(decimals, focalCOmask, otherCOsMask)
+            keep = perceived[rows] & perceived[cols]
+
+            # Remove irreversible moves ######################################
+            keep &= gmcrUtil.permittedMoves(decimals[rows], decimals[cols],
+                                            fwdMask, backMask)
+
+            rows = rows[keep]
+            cols = cols[keep]
+            dm.reachability = scipy.sparse.csr_matrix(
+                (numpy.ones(len(rows), numpy.int_), (rows, cols)),
+                shape=(numStates, numStates))
                                         
 
     def reachable(self,dm,stateIdx):
@@ -124,6 +131,8 @@ class RMGenerator:
         """
         if dm not in self.effectiveDMs:
             raise ValueError("DM or Coalition not valid.")
+        if self.implicit:
+            return dm.reachability.reachable(stateIdx).tolist()
         reachVec = numpy.nonzero(numpy.array(dm.reachability[stateIdx,:].todense())[0])[0].tolist()
         return reachVec
 
@@ -141,6 +150,9 @@ class RMGenerator:
             raise ValueError("DM or Coalition not valid.")
         if refState is None:
             refState = stateIdx
+        if self.implicit:
+            reach = dm.reachability.reachable(stateIdx)
+            return reach[dm.improvements(refState,reach)].tolist()
         UIvec = numpy.nonzero(numpy.array(dm.reachability[stateIdx,:].todense())[0] * dm.improvements(refState))[0].tolist()
         return UIvec
 
@@ -152,9 +164,10 @@ class RMGenerator:
         conflictData = self.conflict.export_rep()
         
         nodes = []
+        feasYN = self.conflict.feasibles.yn[:]
 
         for stateIdx,stateDec in enumerate(self.conflict.feasibles.decimal):
-            stateYN = self.conflict.feasibles.yn[stateIdx]
+            stateYN = feasYN[stateIdx]
             stateOrd = self.conflict.feasibles.ordered[stateIdx]
             reachable = []
 
@@ -178,8 +191,8 @@ class RMGenerator:
 
 class LogicalSolver(RMGenerator):
     """Solves the conflicts for equilibria, based on the logical definitions of stability concepts."""
-    def __init__(self,conflict):
-        RMGenerator.__init__(self,conflict)
+    def __init__(self,conflict,implicit=False):
+        RMGenerator.__init__(self,conflict,implicit=implicit)
 
     def chattyHelper(self,co,state):
         """Used in generating narration for the verbose versions of the stability calculations."""
@@ -256,8 +269,8 @@ class LogicalSolver(RMGenerator):
                     stable=0
                     for state2 in otherDMuis:
                         state2combinedDec = self.conflict.feasibles.decimal[state1]+self.conflict.feasibles.decimal[state2]-self.conflict.feasibles.decimal[state0]
-                        if state2combinedDec in self.conflict.feasibles.decimal:
-                            state2combined = self.conflict.feasibles.decimal.index(state2combinedDec)
+                        state2combined = self.conflict.feasibles.indexOf(state2combinedDec)
+                        if state2combined >= 0:
                             if dm.payoff(state0,state2combined) <= 0:
                                 stable = 1
                                 narr += 'A move to '+self.chattyHelper(dm,state1)+' is SIM sanctioned for focal DM ' + dm.name + ' by a move to '+self.chattyHelper(dm,state2)+' by other DMs, which would give a final state of ' + self.chattyHelper(dm,state2combined) + '.  Check other focal DM UIs for sanctioning...\n\n'
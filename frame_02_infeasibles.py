@@ -163,7 +163,8 @@ class InfeasInpFrame(FrameTemplate):
     def updateTotals(self, event=None):
         """Update data shown in the infobox."""
         numO = len(self.conflict.options)
-        numF = len(self.conflict.feasibles)
+        # counted from the patterns, so no states need to be listed.
+        numF = self.conflict.feasibles.count()
         self.originalStatesText.set('Original States: {}'.format(2**numO))
         self.feasStatesText.set('Feasible States: {}'.format(numF))
         self.removedStatesText.set('States Removed: {}'.format(2**numO - numF))
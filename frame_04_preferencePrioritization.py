@@ -88,8 +88,7 @@ class PreferencesFrame(FrameTemplate):
         self.conflict.recalculateFeasibleStates()
 
         for dm in self.conflict.decisionMakers:
-            dm.calculatePerceived()
-            dm.calculatePreferences()
+            dm.recalculate()
 
         self.lastBuildDMs = self.conflict.decisionMakers.export_rep()
         self.lastBuildOptions = self.conflict.options.export_rep()
@@ -203,7 +202,7 @@ class PreferencesFrame(FrameTemplate):
     def refresh(self, *args):
         """Refresh data in all active display widgets."""
         for dm in self.conflict.decisionMakers:
-            dm.calculatePreferences()
+            dm.recalculate()
         self.editor.reloadOpts()
         self.rankings.refresh()
         self.preferenceDisp.refresh()
@@ -252,8 +251,9 @@ class PreferencesFrame(FrameTemplate):
     def stagePref(self, event=None):
         """Send a condition to the staging area."""
         if self.editor.hasValidIf:
-            for cond in self.editor.ifCond:
-                self.staging.addCondition(cond)
+            # conditional statements cannot be combined with others, so they
+            # are added to the preferences directly.
+            self.addPref()
         else:
             condData = self.editor.getStates()
             newCond = self.conflict.newCondition(condData)
@@ -277,6 +277,9 @@ class PreferencesFrame(FrameTemplate):
         """Triggered when a preference is select from preferences."""
         condition = self.dm.preferences[event.x]
         self.staging.setList(condition)
+        if condition.isConditional:
+            # conditional statements are edited in the entry box instead.
+            self.editor.setConditional(condition)
 
 
 # #############################################################################
@@ -84,8 +84,7 @@ class PreferenceRankingFrame(FrameTemplate):
         self.conflict.recalculateFeasibleStates()
 
         for dm in self.conflict.decisionMakers:
-            dm.calculatePerceived()
-            dm.calculatePreferences()
+            dm.recalculate()
 
         self.lastBuildDMs = self.conflict.decisionMakers.export_rep()
         self.lastBuildOptions = self.conflict.options.export_rep()
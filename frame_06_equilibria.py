@@ -81,8 +81,7 @@ class ResultFrame(FrameTemplate):
         self.conflict.coalitions.validate()
 
         for dm in self.conflict.decisionMakers:
-            dm.calculatePerceived()
-            dm.calculatePreferences()
+            dm.recalculate()
 
         self.lastBuildConflict = self.conflict.export_rep()
 
@@ -70,8 +70,7 @@ class InverseFrame(FrameTemplate):
         self.conflict.recalculateFeasibleStates()
 
         for dm in self.conflict.decisionMakers:
-            dm.calculatePerceived()
-            dm.calculatePreferences()
+            dm.recalculate()
 
         self.lastBuildConflict = self.conflict.export_rep()
 
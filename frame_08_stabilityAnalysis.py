@@ -78,8 +78,7 @@ class StabilityFrame(FrameTemplate):
         self.conflict.recalculateFeasibleStates()
 
         for dm in self.conflict.decisionMakers:
-            dm.calculatePerceived()
-            dm.calculatePreferences()
+            dm.recalculate()
 
         self.lastBuildConflict = self.conflict.export_rep()
 
@@ -1,3 +1,5 @@
+import itertools
+import json
 import unittest
 import data_01_conflictModel
 import data_02_conflictSolvers
@@ -26,7 +28,7 @@ class TestStateSetMath(unittest.TestCase):
 
         # larger example
         a3 = util.reducePatterns(["-Y---", "YY---", "---NY", "NNNY-"])
-        self.assertEqual(a3, ["-Y---", "---NY", "NNNY-"])
+        self.assertEqual(a3, ["-Y---", "---NY", "N-NY-"])
 
         # If elements have different lengths, an exception should be raised.
         with self.assertRaises(ValueError):
@@ -58,7 +60,7 @@ class TestStateSetMath(unittest.TestCase):
     def test_subtractSingleFromGroup(self):
         # basic examples
         a1 = util.rmvSt(['-N-Y-', '-N-NN'], 'NNNY-')
-        self.assertEqual(a1[0], ["YN-Y-", 'NNYY-', '-N-NN'])
+        self.assertEqual(a1[0], ["YN-Y-", '-N-NN', '-NYY-'])
         self.assertEqual(a1[1], 2)
 
         # Results must be presented in minimal form.
@@ -66,12 +68,229 @@ class TestStateSetMath(unittest.TestCase):
         self.assertEqual(a2[0], ['-N---'])
         self.assertEqual(a2[1], 8)
 
+        # patterns clear of the removed one are kept as they are.
+        feas = util.reducePatterns(util._asPatterns(['-N-Y-', '-N-NN',
+                                                     'Y---Y']))
+        a3 = util.rmvSt(feas, util.Pattern.fromYnd('NNNY-'),
+                        util.complementPatterns(feas))
+        self.assertEqual([p.ynd() for p in a3[0]],
+                         ['Y---Y', 'YN---', '-NYY-', '-N-NN'])
+        self.assertIs(a3[0][0], feas[1])
+
     def test_groupSubtract(self):
         # basic examples
         a1 = util.subtractStateSets(['-----'], ["-Y---", "YY---", "---NY", "NNNY-"])
-        self.assertEqual(a1, ["YN-Y-", 'NNYY-', '-N-NN'])
+        self.assertEqual(a1, ["YN-Y-", '-NYY-', '-N-NN'])
         a2 = util.subtractStateSets(['N----', 'YN---'], ["-Y---", "---NY", "NNNY-"])
 
+    def test_minimize(self):
+        # patterns are expanded into prime implicants, even when no pair of
+        # them differs in a single position.
+        a1 = util.reducePatterns(["YY-", "NYY", "-NY"])
+        self.assertEqual(a1, ["YY-", "--Y"])
+
+        # redundant patterns are removed.
+        a2 = util.reducePatterns(["Y-N", "-NN", "NN-", "N-Y", "-YY", "YY-"])
+        self.assertEqual(util.countStates(a2), 6)
+        self.assertEqual(len(a2), 3)
+
+        # a known offSet gives the same result as a calculated one.
+        a3 = util.reducePatterns(["YN-Y-", 'NNYY-', '-N-NN'],
+                                 offSet=["-Y---", "---NY", "NNNY-"])
+        self.assertEqual(a3, ["YN-Y-", '-N-NN', '-NYY-'])
+
+        # overlapping patterns are only counted once.
+        self.assertEqual(util.countStates(["YN-Y-", '-N-NN', '-NYY-']), 10)
+
+    def test_count(self):
+        # counts are found from the patterns, without expanding them.
+        self.assertEqual(util.countStates(["Y" + "-" * 39, "-Y" + "-" * 38]),
+                         3 * 2**38)
+        self.assertEqual(util.countNewStates("NNNY-", ["-Y---", "YY---",
+                                                       "---NY"]), 2)
+        self.assertTrue(util.sameStates(["Y-", "-Y"], ["YN", "-Y"]))
+        self.assertFalse(util.sameStates(["Y-", "-Y"], ["Y-"]))
+        feas = data_01_conflictModel.FeasibleList(["Y" + "-" * 35],
+                                                  offSet=["N" + "-" * 35])
+        self.assertEqual(len(feas), 2**35)
+
+    def test_stateSet(self):
+        # BDD state sets give the same results as patterns.
+        bdd = util.BDD(5)
+        full = bdd.full()
+        infeas = bdd.fromPatterns(["-Y---", "YY---", "---NY", "NNNY-"])
+        feas = full.difference(infeas)
+        expected = util.enumerateStates(
+            5, exclude=["-Y---", "YY---", "---NY", "NNNY-"]).tolist()
+        self.assertEqual(list(feas), expected)
+        self.assertEqual(feas.count(), len(expected))
+        self.assertEqual(feas.union(infeas), full)
+        self.assertTrue(feas.intersection(infeas).isEmpty())
+        self.assertEqual(bdd.fromPatterns(feas.patterns()), feas)
+
+        # the subtraction functions accept state sets.
+        a1 = util.rmvSt(bdd.fromPatterns(['-N-Y-', '-N-NN']), 'NNNY-')
+        self.assertEqual(a1[0], bdd.fromPatterns(["YN-Y-", '-N-NN', '-NYY-']))
+        self.assertEqual(a1[1], 2)
+        a2 = util.subtractStateSets(full, ["-Y---", "YY---", "---NY",
+                                           "NNNY-"])
+        self.assertEqual(a2, feas)
+
+        # large sets are counted without listing them.
+        bdd = util.BDD(48)
+        big = bdd.fromPatterns(["Y" + "-" * 47, "-N" + "-" * 46])
+        self.assertEqual(big.count(), 3 * 2**46)
+
+    def test_pattern(self):
+        # conversion to and from YND notation.
+        p1 = util.Pattern.fromYnd("Y-N-")
+        self.assertEqual((p1.mask, p1.value), (0b0101, 0b0001))
+        self.assertEqual(p1.ynd(), "Y-N-")
+        self.assertEqual(p1.count(), 4)
+        self.assertEqual(p1.states(), [1, 3, 9, 11])
+
+        # Pattern operations give the same results as the YND functions.
+        a1 = util.Pattern.fromYnd("---").subtract(util.Pattern.fromYnd("NYN"))
+        self.assertEqual([p.ynd() for p in a1], ['Y--', 'NN-', 'NYY'])
+        a2 = util.rmvSt(util._asPatterns(['-N-Y-', '-N-NN']),
+                        util.Pattern.fromYnd('NNNY-'))
+        self.assertEqual([p.ynd() for p in a2[0]], ["YN-Y-", '-N-NN', '-NYY-'])
+        self.assertEqual(a2[1], 2)
+        self.assertEqual(util.Pattern.fromYnd("YN-").merge(
+            util.Pattern.fromYnd("NN-")), util.Pattern.fromYnd("-N-"))
+        self.assertIsNone(util.Pattern.fromYnd("YY-").merge(
+            util.Pattern.fromYnd("NN-")))
+
+    def test_enumerate(self):
+        infeas = ["-Y---", "YY---", "---NY", "NNNY-"]
+        feas = util.subtractStateSets(['-----'], infeas)
+        expected = sorted(set(util.yn2dec(yn)
+                              for yn in util.expandPatterns(feas)))
+
+        # scanning with infeasible conditions and expanding the feasible
+        # patterns must give the same sorted states.
+        a1 = util.enumerateStates(5, exclude=infeas, chunkSize=7)
+        self.assertEqual(a1.tolist(), expected)
+        a2 = util.enumerateStates(5, include=feas)
+        self.assertEqual(a2.tolist(), expected)
+        a3 = util.patternStates(feas + ["YN-NN"])
+        self.assertEqual(a3.tolist(), expected)
+
+        # packed bit matrix has one bit per option.
+        bits = util.packStates(a1, 5)
+        unpacked = numpy.unpackbits(bits, axis=1, bitorder='little')[:, :5]
+        self.assertEqual([''.join('Y' if b else 'N' for b in row)
+                          for row in unpacked],
+                         [util.dec2yn(st, 5) for st in expected])
+        self.assertEqual(util.unpackStates(bits).tolist(), expected)
+        matched = util.matchPatterns(bits, ["Y-N--", "---YY"])
+        self.assertEqual(a1[matched].tolist(),
+                         util.filterStates(a1, ["Y-N--", "---YY"]).tolist())
+
+    def test_convertArrays(self):
+        # batch conversions match the single state conversions.
+        states = [0, 1, 6, 19, 31]
+        yn = [util.dec2yn(st, 5) for st in states]
+        self.assertEqual(util.dec2ynArray(states, 5).tolist(), yn)
+        self.assertEqual(util.yn2decArray(yn).tolist(), states)
+        self.assertEqual(util.yn2decArray([]).tolist(), [])
+        with self.assertRaises(ValueError):
+            util.yn2decArray(["YN", "YNN"])
+
+    def test_permittedMoves(self):
+        states = numpy.arange(8)
+        fromStates = numpy.repeat(states, 8)
+        toStates = numpy.tile(states, 8)
+        # option 0 may only be taken forward, option 1 only backward.
+        permitted = util.permittedMoves(fromStates, toStates, 1, 2)
+        for s0, s1, ok in zip(fromStates, toStates, permitted):
+            yn0 = util.dec2yn(int(s0), 3)
+            yn1 = util.dec2yn(int(s1), 3)
+            against = (yn0[0] + yn1[0] == "YN") or (yn0[1] + yn1[1] == "NY")
+            self.assertEqual(ok, not against)
+
+    def test_projectRanking(self):
+        keep = numpy.array([True, False, True, True, False, True])
+        a1 = util.projectRanking([[6, 2], 5, [1, 3, 4], 2], keep)
+        self.assertEqual(a1, [6, [1, 3, 4]])
+        self.assertEqual(util.projectRanking([], keep), [])
+
+    def test_validateRanking(self):
+        feas = data_01_conflictModel.FeasibleList(['Y--', '-N-'])
+        self.assertIsNone(util.validatePreferenceRanking([1, [2, 3], 4, 5, 6],
+                                                         feas))
+        # every problem is reported at once.
+        self.assertEqual(
+            util.validatePreferenceRanking([1, [2, 3], 3, 9, [7]], feas),
+            "States 7, 9 are not feasible states. State 3 cannot appear "
+            "more than once. States 4, 5, 6 are missing.")
+        self.assertEqual(util.validatePreferenceRanking("1, 2", feas),
+                         "Invalid format.")
+        # numpy integers are states like python ints.
+        self.assertIsNone(util.validatePreferenceRanking(
+            [numpy.int64(1), [2, numpy.int64(3)], 4, 5, 6], feas))
+
+        # edits are re-checked incrementally.
+        validator = util.RankingValidator([1, 2, 3, 4, 5, 5], feas)
+        self.assertEqual(validator.errors(), "State 5 cannot appear more "
+                         "than once. State 6 is missing.")
+        validator.update([1, 2, 3, 4, 5, 6])
+        self.assertIsNone(validator.errors())
+        validator.update([1, [2, 6], 4, 5, 6])
+        self.assertEqual(validator.errors(), "State 6 cannot appear more "
+                         "than once. State 3 is missing.")
+
+    def test_rankingPayoffs(self):
+        feas = data_01_conflictModel.FeasibleList(['Y--', '-N-'])
+        ranking = [[6, 2], 5, [1, 3, 4]]
+        payoffs = util.mapPrefRank2Payoffs(ranking, feas)
+        self.assertEqual(payoffs.tolist(), [4, 6, 4, 4, 5, 6])
+        self.assertEqual(util.payoffs2PrefRank(payoffs), [[2, 6], 5,
+                                                          [1, 3, 4]])
+        with self.assertRaises(Exception):
+            util.mapPrefRank2Payoffs([[6, 2], 5, [1, 3]], feas)
+        with self.assertRaises(ValueError):
+            util.mapPrefRank2Payoffs([[6, 2], 5, [1, 3, 4], 7], feas)
+
+    def test_feasibleList(self):
+        feas = data_01_conflictModel.FeasibleList(['Y--', '-N-'])
+        self.assertEqual(list(feas.decimal), [0, 1, 3, 4, 5, 7])
+        self.assertEqual(feas.decimal, [0, 1, 3, 4, 5, 7])
+        self.assertEqual(list(feas.ordered), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(feas.yn), ['NNN', 'YNN', 'YYN', 'NNY', 'YNY',
+                                         'YYY'])
+        self.assertEqual(feas.yn[-1], 'YYY')
+        self.assertEqual(feas.ordDec[2], '  3  [3]')
+        self.assertEqual(feas.toOrdered[4], 4)
+        self.assertEqual(feas.toDecimal[6], 7)
+        self.assertEqual(feas.decimal.index(3), 2)
+        self.assertTrue(5 in feas.decimal)
+        self.assertFalse(2 in feas.decimal)
+        self.assertFalse([1, 2] in feas.ordered)
+        with self.assertRaises(KeyError):
+            feas.toOrdered[2]
+
+        # index lookups, for single states and arrays, in dense and
+        # binary search forms.
+        self.assertEqual(feas.indexOf(5), 4)
+        self.assertEqual(feas.indexOf(2), -1)
+        self.assertEqual(feas.indexOf([7, 6, 0, 9, -1]).tolist(),
+                         [5, -1, 0, -1, -1])
+        large = util.StateIndex([1, 3, 2**40], 41)
+        self.assertEqual(large.find(2**40), 2)
+        self.assertEqual(large.find([3, 4, 2**41]).tolist(), [1, -1, -1])
+        # sparse states are searched rather than given a dense table.
+        sparse = util.StateIndex([1, 3, 2**21], 22)
+        self.assertIsNone(sparse.table)
+        self.assertEqual(sparse.find([2**21, 2]).tolist(), [2, -1])
+        self.assertIsNotNone(util.StateIndex(range(2**18), 22).table)
+
+        # sub-lists keep the ordered numbers of the full list.
+        sub = data_01_conflictModel.FeasibleList(['YY-'],
+                                                 toOrdered=feas.toOrdered)
+        self.assertEqual(list(sub.ordered), [3, 6])
+        self.assertEqual(dict(sub.toDecimal.items()), {3: 3, 6: 7})
+
 
 class TestSolvers(unittest.TestCase):
 
@@ -91,6 +310,312 @@ class TestSolvers(unittest.TestCase):
         self.assertTrue(len(self.conf.decisionMakers) == 0)
         self.assertTrue(len(self.conf.options) == 0)
 
+    def test_incrementalFeasibles(self):
+        # editing the infeasible conditions gives the same results as
+        # calculating them from scratch.
+        self.conf.load_from_file("Examples/MilkRiver.gmcr")
+        infeas = self.conf.infeasibles
+        opts = self.conf.options
+        edits = [lambda: infeas.append([(opts[0], "N"), (opts[1], "N")]),
+                 lambda: infeas.moveCondition(0, 2),
+                 lambda: infeas.removeCondition(1),
+                 lambda: infeas.removeCondition(len(infeas) - 1)]
+        for edit in edits:
+            edit()
+            self.conf.recalculateFeasibleStates()
+            result = (list(self.conf.feasibles.decimal),
+                      [cond.statesRemoved for cond in infeas])
+            self.conf._feasCache = []
+            self.conf._feasDecCache = (None, [], None)
+            self.conf.recalculateFeasibleStates()
+            self.assertEqual(result, (list(self.conf.feasibles.decimal),
+                                      [cond.statesRemoved for cond in infeas]))
+
+        # an appended condition only re-minimizes the patterns it cuts; the
+        # rest of the cover is kept rather than rebuilt.
+        before = self.conf.feasibles.patterns
+        infeas.append([(opts[0], "Y"), (opts[1], "Y")])
+        rmv = infeas[len(infeas) - 1].predicate().patterns[0]
+        kept = [pat for pat in before if not pat.intersects(rmv)]
+        self.assertTrue(kept)
+        self.conf.recalculateFeasibleStates()
+        after = self.conf.feasibles.patterns
+        for pat in kept:
+            self.assertTrue(any(new is pat for new in after))
+
+    def test_bddBackend(self):
+        # storing state sets as BDDs does not change the results.
+        for file in files:
+            self.conf.load_from_file("Examples/" + file + ".gmcr")
+            results = []
+            for useBDD in [False, True]:
+                self.conf.useBDD = useBDD
+                self.conf.recalculateFeasibleStates()
+                for dm in self.conf.decisionMakers:
+                    dm.calculatePerceived()
+                    dm.calculatePreferences()
+                solver = data_02_conflictSolvers.LogicalSolver(self.conf)
+                solver.findEquilibria()
+                results.append((list(self.conf.feasibles.decimal),
+                                [c.statesRemoved for c in self.conf.infeasibles],
+                                [list(dm.perceived.ordered)
+                                 for dm in self.conf.decisionMakers],
+                                solver.allEquilibria.tolist()))
+            self.assertEqual(results[0], results[1])
+
+    def test_conditions(self):
+        # compiled conditions are rebuilt when the options are reordered.
+        for name in "abc":
+            self.conf.options.append(name)
+        a, b, c = self.conf.options
+        cond = data_01_conflictModel.Condition(self.conf, [(a, 'Y'), (c, 'N')])
+        comp = data_01_conflictModel.CompoundCondition(
+            self.conf, [[(b, 'Y')], [(a, 'Y'), (c, 'N')]])
+        self.assertEqual(cond.ynd(), 'Y-N')
+        self.assertIs(cond.predicate(), cond.predicate())
+        self.assertTrue(cond.test(3))
+        self.assertEqual(cond.test(numpy.arange(8)).tolist(),
+                         [False, True, False, True] + [False] * 4)
+        self.assertEqual(comp.test(numpy.arange(8)).tolist(),
+                         [False, True, True, True, False, False, True, True])
+        bits = util.packStates(numpy.arange(8), 3)
+        self.assertEqual(comp.predicate().testBits(bits).tolist(),
+                         comp.test(numpy.arange(8)).tolist())
+
+        self.conf.options.insert(0, self.conf.options.pop(2))
+        self.assertEqual(cond.ynd(), 'NY-')
+        self.assertEqual(cond.export_rep(), [(1, 'Y'), (0, 'N')])
+        self.assertEqual(comp.ynd(), ['--Y', 'NY-'])
+        self.assertFalse(cond.test(3))
+        self.assertTrue(comp.test(4))
+
+    def test_conditionalPreferences(self):
+        # conditional statements match the compound conditions they replace.
+        for name in "abc":
+            self.conf.options.append(name)
+        a, b, c = self.conf.options
+        states = numpy.arange(8)
+        ifCond = self.conf.newConditionalCondition([(a, 'Y')], [(b, 'N')])
+        expanded = self.conf.newCompoundCondition(
+            [[(b, 'N'), (a, 'Y')], [(b, 'Y'), (a, 'Y')], [(b, 'Y'), (a, 'N')]])
+        self.assertEqual(ifCond.test(states).tolist(),
+                         expanded.test(states).tolist())
+        iffCond = self.conf.newConditionalCondition([(a, 'Y'), (c, 'N')],
+                                                    [(b, 'N')], iff=True)
+        self.assertEqual(iffCond.name, "Y-N iff -N-")
+        self.assertEqual([iffCond.test(st) for st in range(8)],
+                         [False, True, True, False, False, False, True, True])
+
+        # they are saved and loaded with the other preferences.
+        self.conf.decisionMakers.append("A")
+        dm = self.conf.decisionMakers[0]
+        for opt in self.conf.options:
+            dm.options.append(opt)
+        dm.preferences.append(ifCond)
+        dm.preferences.append(iffCond)
+        data = json.loads(json.dumps(self.conf.export_rep()))
+        self.conf.__init__()
+        self.conf.json_import(data)
+        dm = self.conf.decisionMakers[0]
+        self.assertEqual([pref.name for pref in dm.preferences],
+                         [ifCond.name, iffCond.name])
+        self.assertEqual(dm.preferences[1].test(states).tolist(),
+                         iffCond.test(states).tolist())
+
+    def test_editConditional(self):
+        # a conditional preference is edited in the 'q if p' entry form,
+        # and can never end up inside a compound condition.
+        for name in "abc":
+            self.conf.options.append(name)
+        a, b, c = self.conf.options
+        ifCond = self.conf.newConditionalCondition([(c, 'Y')], [(a, 'N')])
+        self.assertEqual(ifCond.code(), "3 if -1")
+        iffCond = self.conf.newConditionalCondition([(b, 'N')], [(c, 'Y')],
+                                                    iff=True)
+        self.assertEqual(iffCond.code(), "-2 iff 3")
+        wide = self.conf.newConditionalCondition([(a, 'Y'), (b, 'Y')],
+                                                 [(c, 'Y')])
+        self.assertIsNone(wide.code())
+
+        staged = self.conf.newCompoundCondition([[(a, 'Y')]])
+        with self.assertRaises(TypeError):
+            staged.append(ifCond)
+        self.assertEqual(staged.name, "Y--")
+
+        # the preferences still save and load.
+        self.conf.decisionMakers.append("A")
+        dm = self.conf.decisionMakers[0]
+        for opt in self.conf.options:
+            dm.options.append(opt)
+        dm.preferences.append(ifCond)
+        dm.preferences.append(staged)
+        data = json.loads(json.dumps(self.conf.export_rep()))
+        self.conf.__init__()
+        self.conf.json_import(data)
+        dm = self.conf.decisionMakers[0]
+        self.assertEqual([pref.name for pref in dm.preferences],
+                         [ifCond.name, staged.name])
+        self.assertTrue(dm.preferences[0].isConditional)
+
+    def test_manyPreferences(self):
+        # ranking by more statements than fit in the bits of an int64.
+        conditions = [[[i, yn] for i, yn in zip(opts, yns)]
+                      for opts in itertools.combinations(range(6), 2)
+                      for yns in itertools.product('YN', repeat=2)]
+        conditions += [[[i, 'Y'], [j, 'N'], [k, 'Y']]
+                       for i, j, k in itertools.combinations(range(6), 3)]
+        self.conf.json_import({
+            'useManualPreferenceRanking': False,
+            'options': [{'name': str(i), 'permittedDirection': 'both'}
+                        for i in range(6)],
+            'decisionMakers': [{'name': 'A', 'options': list(range(6)),
+                                'preferences': conditions}],
+            'infeasibles': [[[0, 'Y'], [1, 'Y']]]})
+        dm = self.conf.decisionMakers[0]
+        self.assertEqual(len(dm.preferences), 80)
+        states = self.conf.feasibles.decimal.array
+        raw = [sum(2**(79 - idx) for idx, pref in enumerate(dm.preferences)
+                   if pref.test(int(st))) for st in states]
+        values = sorted(set(raw))
+        self.assertEqual(dm.payoffs.tolist(),
+                         [values.index(r) + 1 for r in raw])
+        expected = [[idx + 1 for idx, r in enumerate(raw) if r == value]
+                    for value in reversed(values)]
+        self.assertEqual(dm.preferenceRanking,
+                         [g[0] if len(g) == 1 else g for g in expected])
+
+    def test_preferenceCache(self):
+        # unchanged preferences reuse the cached results; edits do not.
+        self.conf.load_from_file("Examples/MilkRiver.gmcr")
+        dm = self.conf.decisionMakers[0]
+        dm.calculatePreferences()
+        payoffs = dm.payoffs
+        dm.calculatePreferences()
+        self.assertIs(dm.payoffs, payoffs)
+        dm.preferences.moveCondition(0, len(dm.preferences) - 1)
+        dm.calculatePreferences()
+        self.assertIsNot(dm.payoffs, payoffs)
+        dm.preferences.moveCondition(len(dm.preferences) - 1, 0)
+        dm.calculatePreferences()
+        self.assertIs(dm.payoffs, payoffs)
+        for idx in range(data_01_conflictModel.PREFERENCE_CACHE_SIZE + 2):
+            dm.preferences.moveCondition(0, len(dm.preferences) - 1)
+            dm.calculatePreferences()
+        self.assertLessEqual(len(dm._prefCache),
+                             data_01_conflictModel.PREFERENCE_CACHE_SIZE)
+
+    def test_satisfaction(self):
+        # the satisfaction index agrees with testing each statement.
+        self.conf.load_from_file("Examples/SyriaIraq.gmcr")
+        states = self.conf.feasibles.decimal.array
+        for dm in self.conf.decisionMakers:
+            for idx, pref in enumerate(dm.preferences):
+                self.assertEqual(dm.statesSatisfying(idx).tolist(),
+                                 numpy.flatnonzero(pref.test(states)).tolist())
+            for stateIdx in [0, len(states) - 1]:
+                self.assertEqual(
+                    dm.statementsSatisfied(stateIdx),
+                    [idx for idx, pref in enumerate(dm.preferences)
+                     if pref.test(int(states[stateIdx]))])
+
+    def test_dirtyDMs(self):
+        # only DMs whose inputs changed are recalculated.
+        self.conf.load_from_file("Examples/MilkRiver.gmcr")
+        dms = self.conf.decisionMakers
+        self.assertTrue(all([dm.recalculate() for dm in dms]))
+        self.assertFalse(any([dm.recalculate() for dm in dms]))
+        self.conf.recalculateFeasibleStates()
+        self.assertFalse(any(dm.dirty for dm in dms))
+
+        dms[1].misperceptions.append([(self.conf.options[0], 'Y')])
+        self.assertEqual([dm.recalculate() for dm in dms],
+                         [False, True, False, False])
+        self.assertNotIn(1, dms[1].perceived.decimal.array % 2)
+        dms[2].preferences.removeCondition(0)
+        self.assertEqual([dm.dirty for dm in dms], [False, False, True, False])
+
+        # preferences edited in place, as the preference staging area does.
+        opts = self.conf.options
+        dms[0].preferences.append(
+            {'members': [[(opts[0], 'Y')], [(opts[1], 'N')]]})
+        self.assertTrue(dms[0].recalculate())
+        dms[0].preferences[-1].append(
+            data_01_conflictModel.Condition(self.conf, [(opts[2], 'Y')]))
+        self.assertTrue(dms[0].recalculate())
+        feas = self.conf.feasibles
+        self.assertEqual(
+            numpy.asarray(dms[0].payoffs).tolist(),
+            numpy.asarray(util.prefPriorities2payoffs(dms[0].preferences,
+                                                      feas)[0]).tolist())
+
+        self.conf.infeasibles.append([(self.conf.options[1], 'Y')])
+        self.conf.recalculateFeasibleStates()
+        self.assertTrue(all(dm.dirty for dm in dms))
+
+    def test_sparseFeasibles(self):
+        # a few feasible states in a large state space are listed from the
+        # feasible patterns, matching a scan of the state space.
+        numOpts = 24
+        infeas = [[[i, 'Y']] for i in range(4, numOpts)] + [[[0, 'Y'],
+                                                             [1, 'N']]]
+        self.conf.json_import({
+            'useManualPreferenceRanking': False,
+            'options': [{'name': str(i), 'permittedDirection': 'both'}
+                        for i in range(numOpts)],
+            'decisionMakers': [{'name': 'A', 'options': list(range(numOpts)),
+                                'preferences': [[[0, 'Y']]]}],
+            'infeasibles': infeas})
+        expected = [st for st in range(16) if st & 3 != 1]
+        self.assertEqual(self.conf.feasibles.decimal.array.tolist(), expected)
+        self.assertEqual(self.conf.feasibles.indexOf(15), len(expected) - 1)
+
+    def test_manyOptions(self):
+        # states of conflicts with more than 63 options are stored without
+        # overflowing.
+        numOpts = 66
+        self.conf.json_import({
+            'useManualPreferenceRanking': False,
+            'options': [{'name': str(i), 'permittedDirection': 'both'}
+                        for i in range(numOpts)],
+            'decisionMakers': [
+                {'name': 'A', 'options': list(range(32)),
+                 'preferences': [[[0, 'Y']], [[65, 'N']]]},
+                {'name': 'B', 'options': list(range(32, numOpts)),
+                 'preferences': [[[63, 'Y']], [[64, 'N']]]}],
+            'infeasibles': [[[i, 'Y']] for i in range(1, 63)]})
+        expected = sorted(a + 2**63 * b + 2**64 * c + 2**65 * d
+                          for a in [0, 1] for b in [0, 1]
+                          for c in [0, 1] for d in [0, 1])
+        feas = self.conf.feasibles
+        self.assertEqual(len(feas), 16)
+        self.assertEqual(list(feas.decimal), expected)
+        self.assertEqual(feas.yn[-1], 'Y' + 'N' * 62 + 'YYY')
+        self.assertEqual(feas.indexOf(2**65 + 1), expected.index(2**65 + 1))
+        self.assertEqual(util.unpackStates(feas.bits).tolist(), expected)
+        payoffs = self.conf.decisionMakers[0].payoffs
+        self.assertEqual(payoffs[feas.indexOf(1)], 4)
+        self.assertEqual(payoffs[feas.indexOf(2**65)], 1)
+
+        # reachability is built from the feasible states alone, so the
+        # conflict can be solved.
+        solver = data_02_conflictSolvers.LogicalSolver(self.conf)
+        solver.findEquilibria()
+        eqIdx = [feas.indexOf(1 + 2**63), feas.indexOf(1 + 2**63 + 2**65)]
+        for concept in solver.allEquilibria:
+            self.assertEqual(numpy.flatnonzero(concept).tolist(), eqIdx)
+
+        # irreversible options past the 63rd are restricted without
+        # overflowing, by every reachability backend.
+        self.conf.options[65].permittedDirection = 'fwd'
+        dense = data_02_conflictSolvers.LogicalSolver(self.conf)
+        dense.findEquilibria()
+        for implicit in [False, True]:
+            solver = data_04_spSolvers.LogicalSolver(self.conf,
+                                                     implicit=implicit)
+            solver.findEquilibria()
+            numpy.testing.assert_array_equal(dense.allEquilibria,
+                                             solver.allEquilibria)
+
     def test_logSol(self):
         for file in files:
             self.conf.load_from_file("Examples/" + file + ".gmcr")
@@ -107,6 +632,47 @@ class TestSolvers(unittest.TestCase):
             expected = numpy.loadtxt("test_data/" + file + "_logSol.txt")
             numpy.testing.assert_array_equal(expected, solver.allEquilibria, "Incorrect logical solution for " + file)
 
+    def test_misperceivedMoves(self):
+        self.conf.load_from_file("Examples/SI_misp.gmcr")
+        solver = data_02_conflictSolvers.RMGenerator(self.conf)
+        for dm in solver.effectiveDMs:
+            perceived = dm.perceived.maskIn(self.conf.feasibles)
+            unseen = numpy.flatnonzero(~perceived)
+            seen = numpy.flatnonzero(perceived)
+            self.assertTrue(len(unseen) > 0)
+            self.assertFalse(dm.reachability[unseen, :].any())
+            self.assertFalse(dm.reachability[:, unseen].any())
+            self.assertTrue(dm.reachability[numpy.ix_(seen, seen)].any())
+
+    def test_sparseReachability(self):
+        for file in files + ["SI_misp"]:
+            denseConf = data_01_conflictModel.ConflictModel()
+            denseConf.load_from_file("Examples/" + file + ".gmcr")
+            dense = data_02_conflictSolvers.RMGenerator(denseConf)
+            self.conf.load_from_file("Examples/" + file + ".gmcr")
+            sparse = data_04_spSolvers.RMGenerator(self.conf)
+            for dm, dDM in zip(sparse.effectiveDMs, dense.effectiveDMs):
+                numpy.testing.assert_array_equal(
+                    dm.reachability.toarray(), dDM.reachability,
+                    "Incorrect sparse reachability for " + file)
+
+    def test_implicitReachability(self):
+        for file in files + ["SI_misp"]:
+            sparseConf = data_01_conflictModel.ConflictModel()
+            sparseConf.load_from_file("Examples/" + file + ".gmcr")
+            sparse = data_04_spSolvers.LogicalSolver(sparseConf)
+            sparse.findEquilibria()
+            self.conf.load_from_file("Examples/" + file + ".gmcr")
+            solver = data_04_spSolvers.LogicalSolver(self.conf, implicit=True)
+            for dm, spDM in zip(solver.effectiveDMs, sparse.effectiveDMs):
+                for state in range(len(self.conf.feasibles)):
+                    self.assertEqual(solver.reachable(dm, state),
+                                     sparse.reachable(spDM, state))
+                    self.assertEqual(solver.UIs(dm, state),
+                                     sparse.UIs(spDM, state))
+            solver.findEquilibria()
+            numpy.testing.assert_array_equal(sparse.allEquilibria, solver.allEquilibria, "Incorrect implicit solution for " + file)
+
     # def test_narration(self):
     #     for file in files:
     #         self.conf.load_from_file("Examples/" + file + ".gmcr")
@@ -289,6 +289,18 @@ class RadiobuttonEntry(ttk.Frame):
         self.warnText2.set('Invalid')
         return False
 
+    def setConditional(self, condition):
+        """Load a conditional statement into the entry box for editing."""
+        self.setStates('clear')
+        code = condition.code()
+        if code is None:
+            self.codeText.set('')
+            self.warnText2.set("can't edit " + condition.name)
+            return
+        self.codeText.set(code)
+        self.warnText2.set('')
+        self.handleIf(code, self.regexStatesIf.match(code).groups())
+
     def handleIf(self, string, states):
         """Q if P (equivalent to 'If p, then q')."""
         if int(states[1]) > len(self.stringVarList):
@@ -303,21 +315,11 @@ class RadiobuttonEntry(ttk.Frame):
 
         q = [self.conflict.options[int(states[1]) - 1],
              "N" if states[0] else "Y"]
-        nq = [self.conflict.options[int(states[1]) - 1],
-              "Y" if states[0] else "N"]   # not q
         p = [self.conflict.options[int(states[3]) - 1],
              "N" if states[2] else "Y"]
-        np = [self.conflict.options[int(states[3]) - 1],
-              "Y" if states[2] else "N"]   # not p
-
-        newCondition = None
 
-        if "iff" in string:
-            newCondition = self.conflict.newCompoundCondition([[p, q],
-                                                               [np, nq]])
-        else:
-            newCondition = self.conflict.newCompoundCondition([[p, q], [np, q],
-                                                               [np, nq]])
+        newCondition = self.conflict.newConditionalCondition(
+            [q], [p], iff="iff" in string)
 
         self.setStates(' ' * len(self.stringVarList))
         self.hasValidIf = True
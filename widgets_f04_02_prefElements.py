@@ -169,8 +169,14 @@ class PreferenceStaging(ttk.Frame):
         self.event_generate('<<SelCond>>', x=self.selIdx)
 
     def setList(self, newConditions):
-        """Set the list of conditions to be shown in the staging area."""
+        """Set the list of conditions to be shown in the staging area.
+
+        Conditional statements cannot be combined with other conditions,
+        so they are not staged.
+        """
         self.clear()
+        if newConditions.isConditional:
+            return
         if newConditions.isCompound:
             self.conditionList = newConditions
         else:
@@ -83,8 +83,9 @@ class OptionFormTable(ttk.Frame):
         #fill states
         currCol = 2
         feasibles = self.conflict.feasibles
+        feasYN = feasibles.yn[:]
         for state in range(len(feasibles)):
-            newCol = [feasibles.ordered[state],feasibles.decimal[state]]+list(feasibles.yn[state])
+            newCol = [feasibles.ordered[state],feasibles.decimal[state]]+list(feasYN[state])
             if focusDM is None:
                 for dm in self.conflict.decisionMakers:
                     newCol.append(dm.payoffs[state])
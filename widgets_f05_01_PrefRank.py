@@ -35,6 +35,7 @@ class RankingEditor(ttk.Frame):
         self.prefRankEntry.grid(row=0, column=1, sticky=NSEW)
 
         self.errorDetails = None
+        self.validator = None
 
         self.prefRankEntry.bind("<FocusOut>", self.onFocusOut)
 
@@ -53,8 +54,14 @@ class RankingEditor(ttk.Frame):
             self.master.event_generate("<<errorChange>>")
             return
         prefRank = perceivedRank + self.dm.misperceived
-        self.errorDetails = gmcrUtil.validatePreferenceRanking(
-            prefRank, self.conflict.feasibles)
+        # only entries changed since the last check are re-validated.
+        if (self.validator is None or
+                self.validator.feasibles is not self.conflict.feasibles):
+            self.validator = gmcrUtil.RankingValidator(
+                prefRank, self.conflict.feasibles)
+        else:
+            self.validator.update(prefRank)
+        self.errorDetails = self.validator.errors()
         if self.errorDetails:
             self.errorDetails += ("  Check DM {}'s preference "
                                   "ranking.").format(self.dm.name)
@@ -177,8 +177,9 @@ class OptionFormSolutionTable(ttk.Frame):
         # fill states and stabilities
         currCol = 2
         feasibles = self.conflict.feasibles
+        feasYN = feasibles.yn[:]
         for state in range(len(feasibles)):
-            newCol = [feasibles.ordered[state], feasibles.decimal[state]] + list(feasibles.yn[state])
+            newCol = [feasibles.ordered[state], feasibles.decimal[state]] + list(feasYN[state])
             for dm in self.conflict.decisionMakers:
                 newCol.append(dm.payoffs[state])
             newCol += [("Y" if stability else "N") for stability in self.owner.sol.allEquilibria[:, state]]